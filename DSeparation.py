@@ -0,0 +1,184 @@
+#######################################################################################################################
+import numpy as np
+from Helper import setMask, maskMembers
+#######################################################################################################################
+
+
+class DSeparation:
+    """d-separation oracle of a DAG over the nodes 0, ..., no_of_nodes - 1. The parents, children and ancestors of
+    each node are computed once as integer bitmasks (see Helper.setMask), and each query is answered by Bayes-ball
+    reachability over them: a ball sent from x reaches y along an active trail given S if and only if x and y are
+    d-connected given S"""
+
+    def __init__(self, no_of_nodes, edges):
+        """
+        :param no_of_nodes: number of nodes of the DAG
+        :param edges: iterable of directed edges (i, j), i.e., i --> j [Throw an error if they form a directed cycle]
+        """
+        self.no_of_nodes = no_of_nodes
+        self.parents = [0] * no_of_nodes  # store the bitmask of the parents of each node
+        self.children = [0] * no_of_nodes  # store the bitmask of the children of each node
+        for (i, j) in edges:
+            self.parents[int(j)] |= 1 << int(i)
+            self.children[int(i)] |= 1 << int(j)
+        self.index = None  # store the index of each node label (for DAGs built by fromNxGraph)
+
+        order = []  # topological order (Kahn's algorithm)
+        remaining = [bin(mask).count('1') for mask in self.parents]
+        ready = [v for v in range(no_of_nodes) if remaining[v] == 0]
+        while len(ready) > 0:
+            v = ready.pop()
+            order.append(v)
+            for c in maskMembers(self.children[v]):
+                remaining[c] -= 1
+                if remaining[c] == 0:
+                    ready.append(c)
+        if len(order) < no_of_nodes:
+            raise ValueError("the graph has a directed cycle")
+
+        self.ancestors = [1 << v for v in range(no_of_nodes)]  # store the bitmask of each node and its ancestors
+        for v in order:  # the parents of v come before v
+            for u in maskMembers(self.parents[v]):
+                self.ancestors[v] |= self.ancestors[u]
+
+    ####################################################################################################################
+
+    @classmethod
+    def fromNxGraph(cls, nx_graph):
+        """Return the DSeparation object of nx_graph (networkx.DiGraph object); its nodes are numbered in the order
+        of nx_graph.nodes, and index maps each node label to its number"""
+        labels = list(nx_graph.nodes)
+        index = {label: k for (k, label) in enumerate(labels)}
+        d_sep = cls(len(labels), [(index[i], index[j]) for (i, j) in nx_graph.edges])
+        d_sep.index = index
+        return d_sep
+
+    ####################################################################################################################
+
+    def ancestralMask(self, nodes):
+        """Return the bitmask of nodes (iterable) and their ancestors"""
+        mask = 0
+        for v in nodes:
+            mask |= self.ancestors[int(v)]
+        return mask
+
+    ####################################################################################################################
+
+    def isDSep(self, x, y, S):
+        """Return True if x and y are d-separated by the set S (iterable of nodes other than x and y) and False
+        otherwise"""
+        x, y = int(x), int(y)
+        s_mask = setMask(S)
+        if (s_mask >> x) & 1 or (s_mask >> y) & 1:
+            raise ValueError("x and y must not be in S")
+        return self.isDSepMask(x, y, s_mask)
+
+    ####################################################################################################################
+
+    def isDSepMask(self, x, y, s_mask):
+        """Return True if x and y (int) are d-separated by the set encoded by s_mask (bitmask without x and y)"""
+        a_mask = s_mask
+        for v in maskMembers(s_mask):
+            a_mask |= self.ancestors[v]  # the nodes with a descendant in S (or in S), at which colliders are open
+
+        visited_up = visited_down = 0  # nodes the ball has reached from a child, and from a parent
+        up, down = 1 << x, 0
+        while up or down:
+            visited_up |= up
+            visited_down |= down
+            if ((visited_up | visited_down) >> y) & 1:
+                return False
+            new_up = new_down = 0
+            for v in maskMembers(up & ~s_mask):  # from a child through a non-collider: to the parents and children
+                new_up |= self.parents[v]
+                new_down |= self.children[v]
+            for v in maskMembers(down & ~s_mask):  # from a parent through a chain: to the children
+                new_down |= self.children[v]
+            for v in maskMembers(down & a_mask):  # from a parent through an open collider: to the parents
+                new_up |= self.parents[v]
+            up = new_up & ~visited_up
+            down = new_down & ~visited_down
+        return True
+
+    ####################################################################################################################
+
+    def isDSepBatch(self, x, y, condition_sets):
+        """Return the d-separation of x and y by each set in condition_sets (list of iterables of nodes other than x
+        and y) as a boolean np.ndarray. For DAGs of at most 64 nodes, the balls of all the sets travel together as
+        the bits of uint64 arrays, so the cost of a step is shared by all the sets"""
+        if self.no_of_nodes > 64:
+            return np.array([self.isDSep(x, y, S) for S in condition_sets], dtype=bool)
+        x, y = int(x), int(y)
+        one = np.uint64(1)
+        s_mask = np.array([setMask(S) for S in condition_sets], dtype=np.uint64)
+        if np.any(((s_mask >> np.uint64(x)) & one) | ((s_mask >> np.uint64(y)) & one)):
+            raise ValueError("x and y must not be in S")
+        a_mask = s_mask.copy()
+        for v in maskMembers(int(np.bitwise_or.reduce(s_mask)) if len(s_mask) > 0 else 0):
+            in_S = ((s_mask >> np.uint64(v)) & one).astype(bool)
+            a_mask[in_S] |= np.uint64(self.ancestors[v])
+
+        visited_up = np.zeros(len(s_mask), dtype=np.uint64)
+        visited_down = np.zeros(len(s_mask), dtype=np.uint64)
+        up = np.full(len(s_mask), one << np.uint64(x), dtype=np.uint64)
+        down = np.zeros(len(s_mask), dtype=np.uint64)
+        zero = np.uint64(0)
+        while True:
+            visited_up |= up
+            visited_down |= down
+            active = int(np.bitwise_or.reduce(up | down)) if len(s_mask) > 0 else 0
+            if active == 0:
+                break
+            new_up = np.zeros(len(s_mask), dtype=np.uint64)
+            new_down = np.zeros(len(s_mask), dtype=np.uint64)
+            for v in maskMembers(active):  # only the nodes reached in the last step by the ball of some set
+                bit = one << np.uint64(v)
+                parents = np.uint64(self.parents[v])
+                children = np.uint64(self.children[v])
+                up_open = (up & ~s_mask & bit) != zero
+                down_open = (down & ~s_mask & bit) != zero
+                collider_open = (down & a_mask & bit) != zero
+                new_up |= np.where(up_open | collider_open, parents, zero)
+                new_down |= np.where(up_open | down_open, children, zero)
+            up = new_up & ~visited_up
+            down = new_down & ~visited_down
+        reached = ((visited_up | visited_down) >> np.uint64(y)) & one
+        return reached == zero
+
+    ####################################################################################################################
+
+    def separators(self, x, y, size=None):
+        """Yield the bitmasks of the sets of nodes (other than x and y) which d-separate x and y, each once, without
+        testing every subset: the sets Z with I <= Z <= R are searched by splitting on a node of R - I, and a branch
+        is entered only if it holds a separator, which is the case if and only if R & An({x, y} | I) separates x
+        and y (van der Zander, Liskiewicz and Textor, 2019); so every branch ends with a separator, and the cost is
+        polynomial per separator instead of exponential per pair
+        :param x: a node
+        :param y: a node other than x
+        :param size: yield only the separators of this size if given (default = None); the branches which cannot
+               hold a set of this size are cut
+        """
+        x, y = int(x), int(y)
+        ends = (1 << x) | (1 << y)
+        stack = [(0, ((1 << self.no_of_nodes) - 1) & ~ends)]  # (I, R) with I <= R
+        while len(stack) > 0:
+            I, R = stack.pop()
+            if size is not None:
+                size_I, size_R = bin(I).count('1'), bin(R).count('1')
+                if size_I > size or size_R < size:
+                    continue
+                if size_I == size:  # I is the only set of the branch of this size
+                    R = I
+                elif size_R == size:  # R is the only set of the branch of this size
+                    I = R
+            if not self.isDSepMask(x, y, R & self.ancestralMask(maskMembers(ends | I))):
+                continue  # no separator in the branch (for I == R, I itself is tested)
+            if I == R:
+                yield I
+                continue
+            free = R & ~I
+            v = free & -free  # the lowest node of R - I
+            stack.append((I, R & ~v))
+            stack.append((I | v, R))
+
+#######################################################################################################################
@@ -0,0 +1,231 @@
+#######################################################################################################################
+import json
+import numpy as np
+import warnings
+from itertools import islice
+from os import path, replace, stat
+#######################################################################################################################
+# Loading of the data files (a header of column names followed by whitespace-separated rows). The header and the body
+# are parsed once, and the result is kept in a sidecar cache next to the file: the data as a .npy file, which is
+# memory-mapped on later loads, and the column names with the size and modification time of the text file, which
+# tell whether the cache is still valid. Files that are too large to be loaded are summarized by streaming their rows
+# in chunks into the statistics used by Fisher-Z's test (see streamStatistics).
+#######################################################################################################################
+
+
+def loadData(PATH, use_cache=True):
+    """Load the data file at PATH
+    :param PATH: path of a text file with a header of column names followed by whitespace-separated rows
+    :param use_cache: read the data from the sidecar cache of PATH (memory-mapped, read-only) if it is valid,
+           and write the cache otherwise (default = True)
+    :return:
+    data: the data set (np.ndarray, or a read-only np.memmap if read from the cache)
+    column_names: list of the column names in the header
+    """
+    if use_cache:
+        cached = readDataCache(PATH)
+        if cached is not None:
+            return cached
+
+    with open(PATH) as file:  # the header and the body are parsed in a single pass over the file
+        column_names = file.readline().split()
+        data = np.loadtxt(file)
+    if use_cache:
+        try:
+            writeDataCache(PATH, data, column_names)
+        except OSError as error:  # e.g., a read-only directory: run without the cache
+            warnings.warn(f"cannot write the data cache of {PATH}: {error}")
+    return data, column_names
+
+#######################################################################################################################
+
+
+def columnNames(PATH):
+    """Return the list of column names in the header of the data file at PATH (read from its cache if valid)"""
+    metadata = readCacheMetadata(PATH)
+    if metadata is not None:
+        return metadata["column_names"]
+    with open(PATH) as file:
+        return file.readline().split()
+
+#######################################################################################################################
+
+
+def dataCachePaths(PATH):
+    """Return the paths of the data (.npy) and metadata (.json) of the cache of PATH (hidden files in the same
+    directory, so that directory listings of data files skip them)"""
+    directory, name = path.split(PATH)
+    return path.join(directory, "." + name + ".cache.npy"), path.join(directory, "." + name + ".cache.json")
+
+#######################################################################################################################
+
+
+def sourceSignature(PATH):
+    """Return the size and modification time (in ns) of the file at PATH, which identify the version of the file"""
+    status = stat(PATH)
+    return {"source_size": status.st_size, "source_mtime_ns": status.st_mtime_ns}
+
+#######################################################################################################################
+
+
+def readCacheMetadata(PATH):
+    """Return the metadata of the cache of PATH, or None if there is no cache or PATH has changed since it was written"""
+    metadata_path = dataCachePaths(PATH)[1]
+    if not path.exists(metadata_path):
+        return None
+    try:
+        with open(metadata_path) as file:
+            metadata = json.load(file)
+    except (OSError, ValueError):
+        return None
+    signature = sourceSignature(PATH)
+    if any(metadata.get(key) != value for key, value in signature.items()):
+        return None
+    return metadata
+
+#######################################################################################################################
+
+
+def readDataCache(PATH):
+    """Return (data, column_names) from the cache of PATH with data memory-mapped, or None if it is not valid"""
+    metadata = readCacheMetadata(PATH)
+    if metadata is None:
+        return None
+    try:
+        data = np.load(dataCachePaths(PATH)[0], mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    if list(data.shape) != metadata["shape"]:
+        return None
+    return data, metadata["column_names"]
+
+#######################################################################################################################
+
+
+def writeDataCache(PATH, data, column_names):
+    """Write the cache of PATH holding data (np.ndarray) and column_names (list); each file is written to a temporary
+    file first and then renamed, so that a cache is never read half-written"""
+    data_path, metadata_path = dataCachePaths(PATH)
+    signature = sourceSignature(PATH)
+    metadata = dict(signature, shape=list(data.shape), column_names=column_names)
+    with open(data_path + ".tmp", 'wb') as file:
+        np.save(file, np.ascontiguousarray(data))
+    replace(data_path + ".tmp", data_path)
+    with open(metadata_path + ".tmp", 'w') as file:
+        json.dump(metadata, file)
+    replace(metadata_path + ".tmp", metadata_path)  # the metadata is written last: it validates the data file
+
+#######################################################################################################################
+
+
+def columnOrder(column_names):
+    """Return the indices that reorder the variables X1, X2, ... (in this order) as in column_names"""
+    var_indices = [int(name.split('X')[1]) - 1 for name in column_names]
+    new_indices = np.zeros_like(var_indices)
+    for i in range(1, len(new_indices)):
+        new_indices[var_indices[i]] = range(len(new_indices))[i]
+    return new_indices
+
+#######################################################################################################################
+
+
+class CovarianceAccumulator:
+    """Running mean and co-moment matrix of a stream of rows. Each chunk is centered at its own mean and merged with
+    the pairwise update of Chan et al., so that the memory needed is O(p^2) whatever the number of rows"""
+
+    def __init__(self, no_of_var):
+        self.sample_size = 0  # number of rows seen
+        self.mean = np.zeros(no_of_var)  # mean of the rows seen
+        self.co_moment = np.zeros((no_of_var, no_of_var))  # sum of the outer products of the centered rows
+
+    def update(self, chunk):
+        """Add the rows of chunk (np.ndarray of shape (rows, no_of_var))"""
+        chunk = np.asarray(chunk, dtype=float)
+        if chunk.shape[0] == 0:
+            return
+        chunk_mean = chunk.mean(axis=0)
+        centered = chunk - chunk_mean
+        self.merge(chunk.shape[0], chunk_mean, centered.T @ centered)
+
+    def merge(self, sample_size, mean, co_moment):
+        """Add the statistics of another set of rows (sample size, mean and co-moment matrix)"""
+        total = self.sample_size + sample_size
+        delta = mean - self.mean
+        self.co_moment += co_moment + np.outer(delta, delta) * (self.sample_size * sample_size / total)
+        self.mean += delta * (sample_size / total)
+        self.sample_size = total
+
+    def covariance(self):
+        """Return the sample covariance matrix (as np.cov)"""
+        return self.co_moment / (self.sample_size - 1)
+
+    def correlation(self):
+        """Return the sample correlation matrix (as np.corrcoef)"""
+        std = np.sqrt(np.diag(self.co_moment))
+        corr_mat = self.co_moment / np.outer(std, std)
+        np.fill_diagonal(corr_mat, 1)
+        return corr_mat
+
+#######################################################################################################################
+
+
+def iterateChunks(PATH, chunk_size=100000):
+    """Yield the column names of the data file at PATH, then its rows in chunks of at most chunk_size rows
+    (np.ndarray); .npy files (without a header) are memory-mapped, and text files are read from their data cache if
+    it is valid and parsed chunk by chunk otherwise"""
+    if PATH.endswith(".npy"):
+        data = np.load(PATH, mmap_mode='r')
+        yield ["X" + str(i + 1) for i in range(data.shape[1])]
+        for start in range(0, data.shape[0], chunk_size):
+            yield data[start:start + chunk_size]
+        return
+
+    cached = readDataCache(PATH)
+    if cached is not None:
+        data, column_names = cached
+        yield column_names
+        for start in range(0, data.shape[0], chunk_size):
+            yield data[start:start + chunk_size]
+        return
+
+    with open(PATH) as file:
+        column_names = file.readline().split()
+        yield column_names
+        while True:
+            lines = list(islice(file, chunk_size))
+            if len(lines) == 0:
+                return
+            yield np.loadtxt(lines, ndmin=2)
+
+#######################################################################################################################
+
+
+def streamStatistics(paths, chunk_size=100000):
+    """Compute the correlation matrix and the sample size of the data in the files at paths (one path or a list of
+    paths whose rows are concatenated) reading at most chunk_size rows at a time
+    :param paths: path (string) or list of paths of data files (text files with a header or .npy files)
+    :param chunk_size: maximum number of rows held in memory at a time (default = 100000)
+    :return:
+    corr_mat: correlation matrix of the variables (np.ndarray), in the column order of the first file
+    sample_size: total number of rows (int)
+    column_names: list of the column names
+    """
+    paths = [paths] if isinstance(paths, str) else list(paths)
+    assert len(paths) > 0
+    accumulator = None
+    column_names = None
+    for PATH in paths:
+        chunks = iterateChunks(PATH, chunk_size)
+        names = next(chunks)
+        if column_names is None:
+            column_names = names
+            accumulator = CovarianceAccumulator(len(names))
+        if sorted(names) != sorted(column_names):
+            raise ValueError(f"the columns of {PATH} differ from the columns of {paths[0]}")
+        order = [names.index(name) for name in column_names]  # columns of each file in the order of the first one
+        for chunk in chunks:
+            accumulator.update(chunk[:, order])
+    assert accumulator.sample_size > 1
+    return accumulator.correlation(), accumulator.sample_size, column_names
+
+#######################################################################################################################
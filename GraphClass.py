@@ -4,9 +4,14 @@ import networkx as nx
 import numpy as np
 import pandas as pd
 import warnings
-from copy import deepcopy
-from itertools import permutations
-from Helper import listIntersection, listMinus, listUnion, powerset, fisherZ, chisq
+from copy import copy
+from itertools import combinations
+from DataLoader import columnNames, columnOrder
+from DSeparation import DSeparation
+from GraphCore import AdjacencyCore
+import GraphMotifs
+from Helper import listIntersection, listMinus, fisherZPValue, chisqPValue, fisherZStatistic, \
+    fisherZStatisticBatch, chisqStatistic, encodeData, CITestCache, CriticalValues, SepsetStore
 #######################################################################################################################
 
 
@@ -15,41 +20,218 @@ class CausalGraph:
         self.adjmat = np.zeros((no_of_var, no_of_var))  # store the adjacency matrix of the estimated graph
         np.fill_diagonal(self.adjmat, None)
         self.data = None  # store the data
+        self.data_weights = None  # store the number of occurrences of each row of data (None: once each)
         self.test = str()  # store the name of the conditional independence test
         self.corr_mat = None  # store the correlation matrix of the data
         self.cov_mat = None # store the covariance matrix of the data
         self.nx_graph = nx.DiGraph()  # store the directed graph
         self.nx_skel = nx.Graph()  # store the undirected graph
         self.sample_size = 0 # store the sample size
-        self.sepset = np.empty((no_of_var, no_of_var), object)  # store the collection of sepsets
+        self.sepset = SepsetStore(no_of_var)  # store the collection of sepsets (as bitmasks, once per pair)
         self.definite_UC = []  # store the list of definite unshielded colliders
         self.definite_non_UC = []  # store the list of definite unshielded non-colliders
         self.PC_elapsed = -1  # store the elapsed time of running PC
         self.redundant_nodes = []  # store the list of redundant nodes (for subgraphs)
         self.score = 0 # store the score (e.g., BIC)
+        self.ci_cache = CITestCache()  # store the results of the conditional independence tests (shared by copies)
+        self.ci_log = None  # store the log of the tests run since it was attached (shared by copies)
+        self.critical_values = None  # store the critical values of the tests (for decisions at a fixed alpha)
+        self.data_encoding = None  # store the data with its integer encoding (for Chi_sq and G_sq)
+        self.core = None  # store the compact adjacency core kept in sync with adjmat (if attached)
+        self.tests_run = 0  # store the number of tests run by skeleton discovery
+        self.tests_needed = 0  # store the number of tests up to the first separating set of each pair (see tests_run)
+        self.skeleton_tests = []  # store the number of tests run by skeleton discovery at each depth
+        self.skeleton_tests_needed = []  # store the number of tests needed by skeleton discovery at each depth
+        self.d_separation = None  # store the DSeparation object of nx_graph with the nodes and edges it was built from
 
     ####################################################################################################################
 
     def setTestName(self, name_of_test):
         """Set the conditional independence test that will be used"""
         assert name_of_test in ["Fisher_Z", "Chi_sq", "G_sq"]
+        if name_of_test != self.test:
+            self.ci_cache.clear()  # cached results of another test are no longer valid
+            self.ci_log = None
         self.test = name_of_test
 
     ####################################################################################################################
 
+    def copy(self):
+        """Return a copy of the graph in which only the edges can be changed independently of the original: adjmat,
+        the lists of triples and the networkx graphs are copied, while the data and the test results (data, corr_mat,
+        cov_mat, sepset, ci_cache, ci_log, ...) are shared by reference and must not be modified in place"""
+        cg = copy(self)
+        cg.adjmat = self.adjmat.copy()
+        cg.definite_UC = list(self.definite_UC)
+        cg.definite_non_UC = list(self.definite_non_UC)
+        cg.redundant_nodes = list(self.redundant_nodes)
+        cg.nx_graph = self.nx_graph.copy()
+        cg.nx_skel = self.nx_skel.copy()
+        if self.core is not None:
+            cg.attachCore()
+        return cg
+
+    ####################################################################################################################
+
+    def sampleSize(self):
+        """Return the number of rows in data (or sample_size if the data are not held by the graph)"""
+        if self.data is None:
+            return self.sample_size
+        return self.data.shape[0] if self.data_weights is None else int(np.sum(self.data_weights))
+
+    ####################################################################################################################
+
+    def dataEncoding(self):
+        """Return the integer encoding of data used by Chi_sq and G_sq (computed once for each data set)"""
+        if self.data_encoding is None or self.data_encoding[0] is not self.data:
+            self.data_encoding = (self.data,) + encodeData(self.data)
+        return self.data_encoding[1:]
+
+    ####################################################################################################################
+
+    def ciCache(self):
+        """Return ci_cache, cleared first if its results were computed from other data, i.e., if data, data_weights or
+        corr_mat has been reassigned (compared by identity, as in dataEncoding) or sample_size has changed since"""
+        self.ci_cache.bind((self.data, self.data_weights, self.corr_mat, self.sample_size))
+        return self.ci_cache
+
+    ####################################################################################################################
+
+    def adoptCache(self, ci_cache):
+        """Use ci_cache, which holds the results of earlier runs on the same data and test, as ci_cache, and bind it to
+        the current data of the graph without clearing it (call after data, corr_mat and sample_size are set)"""
+        ci_cache.source = None
+        self.ci_cache = ci_cache
+        self.ciCache()
+
+    ####################################################################################################################
+
     def ci_test(self, i, j, S):
-        """Define the conditional independence test"""
+        """Define the conditional independence test (results are memoized in ci_cache and read from ci_log first)"""
+        p = self.ciCache().get(i, j, S)
+        if p is not None:
+            return p
+        if self.ci_log is not None:
+            p = self.ci_log.pValue(i, j, S)  # tests that have been logged are not run again
+        if p is None:
+            statistic, p = self.ci_statistic(i, j, S)
+            if self.ci_log is not None:
+                self.ci_log.append(i, j, S, statistic, p)
+        self.ci_cache.put(i, j, S, p)
+        return p
+
+    ####################################################################################################################
+
+    def ci_statistic(self, i, j, S):
+        """Run the conditional independence test of i and j given S and return its statistic and p-value"""
         if self.test == "Fisher_Z":
-            return fisherZ(self.corr_mat, i, j, S, self.data.shape[0])
-        elif self.test == "Chi_sq":
-            return chisq(self.data, i, j, S, G_sq=False)
-        elif self.test == "G_sq":
-            return chisq(self.data, i, j, S, G_sq=True)
+            Z = fisherZStatistic(self.corr_mat, i, j, S)
+            return Z, fisherZPValue(Z, self.sampleSize(), len(S))
+        else:
+            chi_sq_stat, df = chisqStatistic(self.data, i, j, S, G_sq=(self.test == "G_sq"),
+                                             encoding=self.dataEncoding(), weights=self.data_weights)
+            return chi_sq_stat, chisqPValue(chi_sq_stat, df)
+
+    ####################################################################################################################
+
+    def ci_test_batch(self, X, Y, condition_sets):
+        """Run the conditional independence tests of X[k] and Y[k] given condition_sets[k] (sets of equal size) and
+        return their p-values as an np.ndarray (results are memoized in ci_cache, and read from ci_log first and
+        logged in it if attached)"""
+        p = np.empty(len(X))
+        self.ciCache()
+        pending = {}  # map the canonical key of each uncached test to its positions in the batch
+        for k in range(len(X)):
+            key = self.ci_cache.key(X[k], Y[k], condition_sets[k])
+            if key in pending:
+                pending[key].append(k)
+                continue
+            cached = self.ci_cache.get(X[k], Y[k], condition_sets[k])
+            if cached is None and self.ci_log is not None:
+                cached = self.ci_log.pValue(X[k], Y[k], condition_sets[k])
+                if cached is not None:
+                    self.ci_cache.put(X[k], Y[k], condition_sets[k], cached)
+            if cached is not None:
+                p[k] = cached
+            else:
+                pending[key] = [k]
+        if len(pending) == 0:
+            return p
+
+        first = [positions[0] for positions in pending.values()]
+        S = np.array([condition_sets[k] for k in first], dtype=int)
+        if self.test == "Fisher_Z":
+            statistics = fisherZStatisticBatch(self.corr_mat, np.array(X)[first], np.array(Y)[first], S)
+            p_new = fisherZPValue(statistics, self.sampleSize(), S.shape[1])
+        else:
+            statistics, p_new = zip(*[self.ci_statistic(X[k], Y[k], condition_sets[k]) for k in first])
+        if self.ci_log is not None:
+            self.ci_log.extend(np.array(X)[first], np.array(Y)[first], S, statistics, p_new)
+        for positions, k, p_k in zip(pending.values(), first, p_new):
+            p[positions] = p_k
+            self.ci_cache.put(X[k], Y[k], condition_sets[k], p_k)
+        return p
+
+    ####################################################################################################################
+
+    def criticalValues(self, alpha):
+        """Return the critical values of the tests at the significance level alpha"""
+        if self.critical_values is None or self.critical_values.alpha != alpha:
+            self.critical_values = CriticalValues(alpha)
+        return self.critical_values
+
+    ####################################################################################################################
+
+    def ci_decision(self, i, j, S, alpha):
+        """Return True if i and j are judged independent given S at the significance level alpha (i.e., p > alpha)
+        by comparing the test statistic with its critical value, without computing the p-value (the statistic is
+        logged in ci_log if attached)"""
+        critical_values = self.criticalValues(alpha)
+        if self.test == "Fisher_Z":
+            Z = fisherZStatistic(self.corr_mat, i, j, S)
+            if self.ci_log is not None:
+                self.ci_log.append(i, j, S, Z)
+            return Z < critical_values.fisherZ(self.sampleSize(), len(S))
+        else:
+            chi_sq_stat, df = chisqStatistic(self.data, i, j, S, G_sq=(self.test == "G_sq"),
+                                             encoding=self.dataEncoding(), weights=self.data_weights)
+            if self.ci_log is not None:
+                self.ci_log.append(i, j, S, chi_sq_stat)
+            return df == 0 or chi_sq_stat < critical_values.chisq(df)
+
+    ####################################################################################################################
+
+    def ci_decision_batch(self, X, Y, condition_sets, alpha):
+        """Run ci_decision on X[k] and Y[k] given condition_sets[k] (sets of equal size) and return the decisions
+        as a boolean np.ndarray"""
+        if self.test == "Fisher_Z":
+            S = np.array(condition_sets, dtype=int)
+            Z = fisherZStatisticBatch(self.corr_mat, X, Y, S)
+            if self.ci_log is not None:
+                self.ci_log.extend(X, Y, S, Z)
+            return Z < self.criticalValues(alpha).fisherZ(self.sampleSize(), S.shape[1])
+        else:
+            return np.array([self.ci_decision(X[k], Y[k], condition_sets[k], alpha) for k in range(len(X))], dtype=bool)
+
+    ####################################################################################################################
+
+    def attachCore(self):
+        """Attach an AdjacencyCore built from adjmat; while attached, adjmat must only be changed through the
+        methods of CausalGraph (addDirectedEdge, addBiDirectedEdge, addUndirectedEdge, removeAdj, removeOrientation)"""
+        self.core = AdjacencyCore(self.adjmat)
+
+    ####################################################################################################################
+
+    def detachCore(self):
+        """Detach the AdjacencyCore so that adjmat can be changed directly again"""
+        self.core = None
 
     ####################################################################################################################
 
     def neighbors(self, i):
         """Find the neighbors of node i in adjmat"""
+        if self.core is not None:
+            return self.core.neighbors(i)
         l0 = np.where(self.adjmat[i, :] == 0)[0]
         l1 = np.where(self.adjmat[i, :] == 1)[0]
         return np.concatenate((l0, l1))
@@ -58,6 +240,8 @@ class CausalGraph:
 
     def maxDegree(self):
         """Return the maximum number of edges connected to a node in adjmat"""
+        if self.core is not None:
+            return self.core.maxDegree()
         nodes = range(len(self.adjmat))
         max_degree = 0
         for i in nodes:
@@ -164,33 +348,26 @@ class CausalGraph:
 
     def findUnshieldedTriples(self):
         """Return the list of unshielded triples i o-o j o-o k in adjmat as (i, j, k)"""
-        return [(pair[0][0], pair[0][1], pair[1][1]) for pair in permutations(self.findAdj(), 2)
-                if pair[0][1] == pair[1][0] and pair[0][0] != pair[1][1] and self.adjmat[pair[0][0], pair[1][1]] == -1]
+        return GraphMotifs.findUnshieldedTriples(self.adjmat)
 
     ####################################################################################################################
 
     def findTriangles(self):
         """Return the list of triangles i o-o j o-o k o-o i in adjmat as (i, j, k) [with symmetry]"""
-        Adj = self.findAdj()
-        return [(pair[0][0], pair[0][1], pair[1][1]) for pair in permutations(Adj, 2)
-                if pair[0][1] == pair[1][0] and pair[0][0] != pair[1][1] and (pair[0][0], pair[1][1]) in Adj]
+        return GraphMotifs.findTriangles(self.adjmat)
 
     ####################################################################################################################
 
     def findKites(self):
         """Return the list of non-ambiguous kites i o-o j o-o l o-o k o-o i o-o l in adjmat \
         (where j and k are non-adjacent) as (i, j, k, l) [with asymmetry j < k]"""
-        return [(pair[0][0], pair[0][1], pair[1][1], pair[0][2]) for pair in permutations(self.findTriangles(), 2)
-                if pair[0][0] == pair[1][0] and pair[0][2] == pair[1][2]
-                and pair[0][1] < pair[1][1] and self.adjmat[pair[0][1], pair[1][1]] == -1]
+        return GraphMotifs.findKites(self.adjmat)
 
     ####################################################################################################################
 
     def findUC(self):
         """Return the list of unshielded colliders i --> j <-- k in adjmat as (i, j, k) [with asymmetry i < k]"""
-        directed = self.findFullyDirected()
-        return [(pair[0][0], pair[0][1], pair[1][0]) for pair in permutations(directed, 2)
-                if pair[0][1] == pair[1][1] and pair[0][0] < pair[1][0] and self.adjmat[pair[0][0], pair[1][0]] == -1]
+        return GraphMotifs.findUC(self.adjmat)
 
     ####################################################################################################################
 
@@ -291,25 +468,48 @@ class CausalGraph:
 
     ####################################################################################################################
 
-    def findCondSets(self, i, j):
-        """return the list of conditioning sets of the neighbors of i or j in adjmat"""
-        neigh_x = self.neighbors(i)
-        neigh_y = self.neighbors(j)
-        pow_neigh_x = powerset(neigh_x)
-        pow_neigh_y = powerset(neigh_y)
-        return listUnion(pow_neigh_x, pow_neigh_y)
+    def iterCondSets(self, i, j, max_size=None):
+        """yield the conditioning sets of the neighbors of i or j in adjmat lazily, each once as a sorted tuple, in
+        ascending order of size (up to max_size if given): the subsets of the neighbors of i of each size, then the
+        subsets of the neighbors of j of that size which are not subsets of the neighbors of i"""
+        neigh_x = sorted(int(v) for v in self.neighbors(i))
+        neigh_y = sorted(int(v) for v in self.neighbors(j))
+        only_y = set(neigh_y) - set(neigh_x)  # a subset of the neighbors of j is new if it has one of these nodes
+        largest = max(len(neigh_x), len(neigh_y))
+        if max_size is not None:
+            largest = min(largest, max_size)
+        for size in range(largest + 1):
+            yield from combinations(neigh_x, size)
+            if len(only_y) > 0:
+                for S in combinations(neigh_y, size):
+                    if not only_y.isdisjoint(S):
+                        yield S
+
+    ####################################################################################################################
+
+    def iterCondSetsSplit(self, i, j, k, max_size=None):
+        """yield (S, k in S) for each conditioning set S of iterCondSets(i, j, max_size), so that the sets which
+        contain k and the sets which do not are told apart in a single pass"""
+        for S in self.iterCondSets(i, j, max_size):
+            yield S, k in S
+
+    ####################################################################################################################
+
+    def findCondSets(self, i, j, max_size=None):
+        """return the list of conditioning sets of the neighbors of i or j in adjmat (see iterCondSets)"""
+        return list(self.iterCondSets(i, j, max_size))
 
     ####################################################################################################################
 
-    def findCondSetsWithMid(self, i, j, k):
+    def findCondSetsWithMid(self, i, j, k, max_size=None):
         """return the list of conditioning sets of the neighbors of i or j in adjmat which contains k"""
-        return [S for S in self.findCondSets(i, j) if k in S]
+        return [S for (S, has_k) in self.iterCondSetsSplit(i, j, k, max_size) if has_k]
 
     ####################################################################################################################
 
-    def findCondSetsWithoutMid(self, i, j, k):
+    def findCondSetsWithoutMid(self, i, j, k, max_size=None):
         """return the list of conditioning sets of the neighbors of i or j which in adjmat does not contain k"""
-        return [S for S in self.findCondSets(i, j) if k not in S]
+        return [S for (S, has_k) in self.iterCondSetsSplit(i, j, k, max_size) if not has_k]
 
     ####################################################################################################################
 
@@ -320,11 +520,29 @@ class CausalGraph:
 
     ####################################################################################################################
 
+    def dSeparation(self):
+        """Return the DSeparation object of nx_graph (built again only when the nodes or edges of nx_graph change)
+        [Throw an error if nx_graph is not a DAG]"""
+        signature = (tuple(self.nx_graph.nodes), tuple(self.nx_graph.edges))
+        if self.d_separation is None or self.d_separation[0] != signature:
+            self.d_separation = (signature, DSeparation.fromNxGraph(self.nx_graph))
+        return self.d_separation[1]
+
+    ####################################################################################################################
+
     def isDSep(self, i, j, S):
         """Return True if i and j are d-separated by the set S in nx_graph (networkx.Digraph object)
         and False otherwise. [Throw an error if nx_graph is not a DAG]"""
-        assert self.isDag()
-        return nx.d_separated(self.nx_graph, {i}, {j}, S)
+        d_sep = self.dSeparation()
+        return d_sep.isDSep(d_sep.index[i], d_sep.index[j], [d_sep.index[k] for k in S])
+
+    ####################################################################################################################
+
+    def isDSepBatch(self, i, j, condition_sets):
+        """Return whether i and j are d-separated by each set in condition_sets in nx_graph as a boolean np.ndarray
+        [Throw an error if nx_graph is not a DAG]"""
+        d_sep = self.dSeparation()
+        return d_sep.isDSepBatch(d_sep.index[i], d_sep.index[j], [[d_sep.index[k] for k in S] for S in condition_sets])
 
     ####################################################################################################################
 
@@ -379,6 +597,8 @@ class CausalGraph:
         """Add i --> j to adjmat"""
         self.adjmat[i, j] = 1
         self.adjmat[j, i] = 0
+        if self.core is not None:
+            self.core.setMarks(i, j, 1, 0)
 
     ####################################################################################################################
 
@@ -386,6 +606,8 @@ class CausalGraph:
         """Add i <-> j to adjmat"""
         self.adjmat[i, j] = 1
         self.adjmat[j, i] = 1
+        if self.core is not None:
+            self.core.setMarks(i, j, 1, 1)
 
     ####################################################################################################################
 
@@ -393,6 +615,8 @@ class CausalGraph:
         """Add i --- j to adjmat"""
         self.adjmat[i, j] = 0
         self.adjmat[j, i] = 0
+        if self.core is not None:
+            self.core.setMarks(i, j, 0, 0)
 
     ####################################################################################################################
 
@@ -401,6 +625,8 @@ class CausalGraph:
         assert (self.adjmat[i, j] != -1 and self.adjmat[j, i] != -1)
         self.adjmat[i, j] = -1
         self.adjmat[j, i] = -1
+        if self.core is not None:
+            self.core.setMarks(i, j, -1, -1)
 
     ####################################################################################################################
 
@@ -409,6 +635,8 @@ class CausalGraph:
         assert (self.adjmat[i, j] != -1 and self.adjmat[j, i] != -1)
         self.adjmat[i, j] = 0
         self.adjmat[j, i] = 0
+        if self.core is not None:
+            self.core.setMarks(i, j, 0, 0)
 
     ####################################################################################################################
 
@@ -456,13 +684,7 @@ class CausalGraph:
 
     def rearrange(self, PATH):
         """Rearrange adjmat according to the data imported at PATH"""
-        raw_col_names = list(pd.read_csv(PATH, sep='\t').columns)
-        var_indices = []
-        for name in raw_col_names:
-            var_indices.append(int(name.split('X')[1]) - 1)
-        new_indices = np.zeros_like(var_indices)
-        for i in range(1, len(new_indices)):
-            new_indices[var_indices[i]] = range(len(new_indices))[i]
+        new_indices = columnOrder(columnNames(PATH))  # only the header (or the data cache) is read
         output = self.adjmat[:, new_indices]
         output = output[new_indices, :]
         self.adjmat = output
@@ -523,6 +745,11 @@ class CausalGraph:
         print("Number of directed edges:", len(self.findFullyDirected()))
         print("Number of undirected edges:", int(len(self.findUndirected()) / 2))
         print("Number of bi-directed edges:", int(len(self.findBiDirected()) / 2))
+        log_hits = self.ci_log.hits if self.ci_log is not None else 0
+        print("CI tests computed (cache hits, hit rate):",
+              f"{self.ci_cache.misses - log_hits} ({self.ci_cache.hits}, {round(self.ci_cache.hitRate(), 3)})")
+        if self.ci_log is not None:
+            print("CI tests logged (reused from the log):", f"{len(self.ci_log)} ({log_hits})")
         print("PC elapsed time (in seconds):", round(self.PC_elapsed, 3), "\n")
 
     ####################################################################################################################
@@ -672,10 +899,10 @@ def tetradToCausalGraph(path):
     """Convert the graph (.txt output by TETRAD) at path into a CausalGraph object"""
     tetrad_file = pd.read_csv(path, sep='\t')
     var_names = str()
-    if ',' in str(tetrad_file.loc[0][0]):
-        var_names = str(tetrad_file.loc[0][0]).split(',')
-    elif ';' in str(tetrad_file.loc[0][0]):
-        var_names = str(tetrad_file.loc[0][0]).split(';')
+    if ',' in str(tetrad_file.iloc[0, 0]):
+        var_names = str(tetrad_file.iloc[0, 0]).split(',')
+    elif ';' in str(tetrad_file.iloc[0, 0]):
+        var_names = str(tetrad_file.iloc[0, 0]).split(';')
 
     cg = CausalGraph(len(var_names))
     cg.adjmat[cg.adjmat == 0] = -1
@@ -683,7 +910,7 @@ def tetradToCausalGraph(path):
     bidirected = 0
 
     for i in range(2, tetrad_file.shape[0]):
-        STR = str(tetrad_file.loc[i][0])
+        STR = str(tetrad_file.iloc[i, 0])
         if '-->' in STR:
             STR_truncated = STR.split('. ')[1].split(' --> ')
             LEFT = int(STR_truncated[0].split('X')[1]) - 1
@@ -736,7 +963,7 @@ def toPattern(cg, checkDAG = True):
     """Convert cg (a Causal Graph object) to its pattern [Throw an error if cg.nx_graph is not a DAG]"""
     if checkDAG:
         assert cg.isDag()
-    cg_pattern = deepcopy(cg)
+    cg_pattern = cg.copy()
     cg_pattern.adjmat[cg_pattern.adjmat == 1] = 0  # remove all arrowheads to obtain the skeleton
 
     UC = cg.findUC()
@@ -777,7 +1004,7 @@ def toPattern(cg, checkDAG = True):
 
 def subgraph(cg, list_of_nodes):
     """Create a CausalGraph object from cg by only including nodes in list_of_nodes (list)"""
-    sub_cg = deepcopy(cg)
+    sub_cg = cg.copy()
     redundant_nodes = listMinus(range(len(cg.adjmat)), list_of_nodes)
     for i in redundant_nodes:
         sub_cg.adjmat[i, :] = None
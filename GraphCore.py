@@ -0,0 +1,64 @@
+#######################################################################################################################
+import numpy as np
+#######################################################################################################################
+
+
+class AdjacencyCore:
+    """Compact storage of the adjacencies of a CausalGraph: per-node neighbor sets, an incrementally maintained
+    degree array and int8 edge marks (-1: no edge, 0: tail, 1: arrowhead, -2: no mark such as the diagonal)"""
+
+    def __init__(self, adjmat):
+        no_of_var = adjmat.shape[0]
+        self.marks = np.full((no_of_var, no_of_var), -2, dtype=np.int8)  # store the edge marks of adjmat
+        known = ~np.isnan(adjmat)
+        self.marks[known] = adjmat[known]
+        adjacent = (self.marks == 0) | (self.marks == 1)
+        self.neighbor_sets = [set(np.where(adjacent[i])[0].tolist()) for i in range(no_of_var)]  # store adj(i)
+        self.degree = adjacent.sum(axis=1).astype(np.int32)  # store |adj(i)|
+        self.neighbor_arrays = [None] * no_of_var  # store neighbors(i) as returned by CausalGraph.neighbors
+
+    ####################################################################################################################
+
+    def neighbors(self, i):
+        """Return the neighbors of node i (tails first, then arrowheads, each in ascending order)"""
+        if self.neighbor_arrays[i] is None:
+            neigh = sorted(self.neighbor_sets[i])
+            tails = [j for j in neigh if self.marks[i, j] == 0]
+            arrowheads = [j for j in neigh if self.marks[i, j] == 1]
+            self.neighbor_arrays[i] = np.array(tails + arrowheads, dtype=np.int64)
+        return self.neighbor_arrays[i]
+
+    ####################################################################################################################
+
+    def isAdj(self, i, j):
+        """Return True if j is a neighbor of i and False otherwise"""
+        return j in self.neighbor_sets[i]
+
+    ####################################################################################################################
+
+    def maxDegree(self):
+        """Return the maximum number of edges connected to a node"""
+        return int(self.degree.max()) if len(self.degree) > 0 else 0
+
+    ####################################################################################################################
+
+    def setMarks(self, i, j, mark_ij, mark_ji):
+        """Set the marks of i o-o j to mark_ij at j and mark_ji at i (-1 removes the adjacency)"""
+        was_adjacent = j in self.neighbor_sets[i]
+        is_adjacent = mark_ij in [0, 1] and mark_ji in [0, 1]
+        self.marks[i, j] = mark_ij
+        self.marks[j, i] = mark_ji
+        if was_adjacent and not is_adjacent:
+            self.neighbor_sets[i].discard(j)
+            self.neighbor_sets[j].discard(i)
+            self.degree[i] -= 1
+            self.degree[j] -= 1
+        elif is_adjacent and not was_adjacent:
+            self.neighbor_sets[i].add(j)
+            self.neighbor_sets[j].add(i)
+            self.degree[i] += 1
+            self.degree[j] += 1
+        self.neighbor_arrays[i] = None
+        self.neighbor_arrays[j] = None
+
+#######################################################################################################################
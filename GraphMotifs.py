@@ -0,0 +1,67 @@
+#######################################################################################################################
+import numpy as np
+#######################################################################################################################
+# Enumeration of the structures used by the orientation rules. Each function walks the neighbor lists of adjmat, so
+# its cost is proportional to the number of structures found (instead of scanning all the pairs of edges), and it
+# returns the structures in the same order as the edge-pair scans of GraphClass.py and Helper.py.
+#######################################################################################################################
+
+
+def neighborLists(adjmat):
+    "Return the list of neighbors of each node in the adjacency matrix adjmat (np.ndarray): tails first, then \
+    arrowheads, each in ascending order (i.e., the order of the rows of findAdj)"
+    return [np.where(adjmat[i, :] == 0)[0].tolist() + np.where(adjmat[i, :] == 1)[0].tolist()
+            for i in range(adjmat.shape[0])]
+
+#######################################################################################################################
+
+
+def adjacencyList(adjmat):
+    "Return the list of adjacencies (i, j) in the order of findAdj (all the tails, then all the arrowheads)"
+    tails = np.where(adjmat == 0)
+    arrowheads = np.where(adjmat == 1)
+    return list(zip(tails[0].tolist(), tails[1].tolist())) + list(zip(arrowheads[0].tolist(), arrowheads[1].tolist()))
+
+#######################################################################################################################
+
+
+def findUnshieldedTriples(adjmat):
+    "Return the list of unshielded triples i o-o j o-o k as (i, j, k) in the adjacency matrix adjmat (np.ndarray)"
+    neigh = neighborLists(adjmat)
+    return [(i, j, k) for (i, j) in adjacencyList(adjmat) for k in neigh[j] if k != i and adjmat[i, k] == -1]
+
+#######################################################################################################################
+
+
+def findTriangles(adjmat):
+    "Return the list of triangles i o-o j o-o k o-o i as (i, j, k) in the adjacency matrix adjmat (np.ndarray) \
+    [with symmetry]"
+    neigh = neighborLists(adjmat)
+    adjacent = (adjmat == 0) | (adjmat == 1)
+    return [(i, j, k) for (i, j) in adjacencyList(adjmat) for k in neigh[j] if k != i and adjacent[i, k]]
+
+#######################################################################################################################
+
+
+def findKites(adjmat, triangles=None):
+    "Return the list of kites i o-o j o-o l o-o k o-o i o-o l (where j and k are non-adjacent) as (i, j, k, l) \
+    in the adjacency matrix adjmat (np.ndarray) [with asymmetry j < k]; triangles: the output of findTriangles"
+    neigh = neighborLists(adjmat)
+    adjacent = (adjmat == 0) | (adjmat == 1)
+    triangles = findTriangles(adjmat) if triangles is None else triangles
+    return [(i, j, k, l) for (i, j, l) in triangles for k in neigh[i]
+            if k > j and adjacent[k, l] and adjmat[j, k] == -1]
+
+#######################################################################################################################
+
+
+def findUC(adjmat):
+    "Return the list of unshielded colliders i --> j <-- k as (i, j, k) in the adjacency matrix adjmat (np.ndarray) \
+    [with asymmetry i < k]"
+    directed = (adjmat == 1) & (adjmat.T == 0)
+    parents = [np.where(directed[:, j])[0].tolist() for j in range(adjmat.shape[0])]
+    arrowheads = np.where(adjmat == 1)
+    return [(i, j, k) for (i, j) in zip(arrowheads[0].tolist(), arrowheads[1].tolist()) if directed[i, j]
+            for k in parents[j] if k > i and adjmat[i, k] == -1]
+
+#######################################################################################################################
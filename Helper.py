@@ -1,5 +1,7 @@
+from array import array
+from collections import OrderedDict
 from copy import deepcopy
-from itertools import combinations, chain, permutations
+from itertools import combinations, chain
 from math import sqrt, log
 from scipy.stats import norm, chi2
 
@@ -8,81 +10,58 @@ import networkx as nx
 import numpy as np
 import pandas as pd
 import warnings
+import GraphMotifs
+from DataLoader import columnNames, columnOrder
 
 #######################################################################################################################
 
 def fisherZ(correlation_matrix, X, Y, condition_set, sample_size):
     "Perform an independence test using Fisher-Z's test and output the p-value of the test"
-    var = list((X, Y) + condition_set)
+    Z = fisherZStatistic(correlation_matrix, X, Y, condition_set)
+    # p = 2 * (1 - norm.cdf(abs(X)))
+    p = fisherZPValue(Z, sample_size, len(condition_set))
+    return p
+
+#######################################################################################################################
+
+def fisherZPValue(Z, sample_size, size_of_S):
+    "Output the p-value of Fisher-Z's test with statistic |Z| (float or np.ndarray)"
+    X = np.sqrt(sample_size - size_of_S - 3) * Z
+    return 1 - norm.cdf(X)
+
+#######################################################################################################################
+
+def fisherZStatistic(correlation_matrix, X, Y, condition_set):
+    "Output |Z|, the absolute Fisher-Z transform of the partial correlation of X and Y given condition_set"
+    var = list((X, Y) + tuple(condition_set))
     sub_corr_matrix = correlation_matrix[np.ix_(var, var)]
     inv = np.linalg.inv(sub_corr_matrix)
     r = -inv[0, 1] / sqrt(inv[0, 0] * inv[1, 1])
     Z = 0.5 * log((1 + r) / (1 - r))
-    X = sqrt(sample_size - len(condition_set) - 3) * abs(Z)
-    # p = 2 * (1 - norm.cdf(abs(X)))
-    p = 1 - norm.cdf(abs(X))
-    return p
+    return abs(Z)
 
 #######################################################################################################################
 
-def chisq(data, X, Y, conditioning_set, G_sq=False):
-    "Perform an independence test using chi-square test and output the p-value of the test"
-    # Step 1: Subset the data
-    categories_list = [np.unique(data[:, i]) for i in list(conditioning_set)]  # Obtain the categories of each variable in conditioning_set
-    value_config_list = cartesian_product(categories_list)  # Obtain all the possible value configurations of the conditioning_set (e.g., [[]] if categories_list == [])
-
-    max_categories = int(np.max(data)) + 1  # Used to fix the size of the contingency table (before applying Fienberg's method)
+def fisherZStatisticBatch(correlation_matrix, X, Y, condition_sets):
+    "Output |Z| for a batch of tests of X[k] and Y[k] given condition_sets[k] (np.ndarray of shape (k, |S|))"
+    var = np.column_stack((X, Y, condition_sets)).astype(int)
+    sub_corr_matrices = correlation_matrix[var[:, :, None], var[:, None, :]]  # stack of (|S| + 2, |S| + 2) matrices
+    inv = np.linalg.inv(sub_corr_matrices)
+    r = -inv[:, 0, 1] / np.sqrt(inv[:, 0, 0] * inv[:, 1, 1])
+    Z = 0.5 * np.log((1 + r) / (1 - r))
+    return np.abs(Z)
 
-    sum_of_chi_square = 0  # initialize a zero chi_square statistic
-    sum_of_df = 0  # initialize a zero degree of freedom
+#######################################################################################################################
 
-    def recursive_and(L):
-        "A helper function for subsetting the data using the conditions in L of the form [(variable, value),...]"
-        if len(L) == 0:
-            return data
-        else:
-            condition = data[:, L[0][0]] == L[0][1]
-            i = 1
-            while i < len(L):
-                new_conjunct = data[:, L[i][0]] == L[i][1]
-                condition = new_conjunct & condition
-                i += 1
-            return data[condition]
-
-    for value_config in range(len(value_config_list)):
-        L = list(zip(conditioning_set, value_config_list[value_config]))
-        sub_data = recursive_and(L)[:, [X, Y]]  # obtain the subset dataset (containing only the X, Y columns) with only rows specifed in value_config
-
-        # Step 2: Generate contingency table (applying Fienberg's method)
-        def make_ctable(D, cat_size):
-            x = np.array(D[:, 0], dtype=np.dtype(int))
-            y = np.array(D[:, 1], dtype=np.dtype(int))
-            bin_count = np.bincount(cat_size * x + y)  # Perform linear transformation to obtain frequencies
-            diff = (cat_size ** 2) - len(bin_count)
-            if diff > 0:  # The number of cells generated by bin_count can possibly be less than cat_size**2
-                bin_count = np.concatenate((bin_count, np.zeros(diff)))  # In that case, we concatenate some zeros to fit cat_size**2
-            ctable = bin_count.reshape(cat_size, cat_size)
-            ctable = ctable[~np.all(ctable == 0, axis=1)]  # Remove rows consisted entirely of zeros
-            ctable = ctable[:, ~np.all(ctable == 0, axis=0)]  # Remove columns consisted entirely of zeros
-            return ctable
-
-        ctable = make_ctable(sub_data, max_categories)
-
-        # Step 3: Calculate chi-square statistic and degree of freedom from the contingency table
-        row_sum = np.sum(ctable, axis=1)
-        col_sum = np.sum(ctable, axis=0)
-        expected = np.outer(row_sum, col_sum) / sub_data.shape[0]
-        if G_sq == False:
-            chi_sq_stat = np.sum(((ctable - expected) ** 2) / expected)
-        else:
-            div = np.divide(ctable, expected)
-            div[div == 0] = 1  # It guarantees that taking natural log in the next step won't cause any error
-            chi_sq_stat = 2 * np.sum(ctable * np.log(div))
-        df = (ctable.shape[0] - 1) * (ctable.shape[1] - 1)
+def chisq(data, X, Y, conditioning_set, G_sq=False, encoding=None, weights=None):
+    "Perform an independence test using chi-square test and output the p-value of the test"
+    sum_of_chi_square, sum_of_df = chisqStatistic(data, X, Y, conditioning_set, G_sq, encoding, weights)
+    return chisqPValue(sum_of_chi_square, sum_of_df)
 
-        sum_of_chi_square += chi_sq_stat
-        sum_of_df += df
+#######################################################################################################################
 
+def chisqPValue(sum_of_chi_square, sum_of_df):
+    "Output the p-value of the chi-square (or G-square) test with the given statistic and degree of freedom"
     # Step 4: Compute p-value from chi-square CDF
     if sum_of_df == 0:
         return 1
@@ -91,12 +70,330 @@ def chisq(data, X, Y, conditioning_set, G_sq=False):
 
 #######################################################################################################################
 
-def appendValue(array, i, j, value):
-    "Append value to the list at array[i, j]"
-    if array[i, j] == None:
-        array[i, j] = [value]
+def encodeData(data, columns=None):
+    "Encode each column of data (np.ndarray) by the integers 0, 1, ..., k - 1 and output the codes (np.ndarray) \
+    with the number of categories k of each column (np.ndarray); only the given columns are encoded if specified"
+    columns = range(data.shape[1]) if columns is None else columns
+    codes = np.zeros(data.shape, dtype=np.int64)
+    no_of_categories = np.ones(data.shape[1], dtype=np.int64)
+    for i in columns:
+        categories, codes[:, i] = np.unique(data[:, i], return_inverse=True)
+        no_of_categories[i] = len(categories)
+    return codes, no_of_categories
+
+#######################################################################################################################
+
+def chisqStatistic(data, X, Y, conditioning_set, G_sq=False, encoding=None, weights=None):
+    "Output the chi-square (or G-square) statistic and the degree of freedom of the test of X and Y given \
+    conditioning_set, summed over the strata of conditioning_set observed in data \
+    (encoding: the output of encodeData(data), computed for the columns being tested if None; \
+    weights: the number of occurrences of each row of data, once each if None)"
+    conditioning_set = list(conditioning_set)
+    if encoding is None:
+        encoding = encodeData(data, [X, Y] + conditioning_set)
+    codes, no_of_categories = encoding
+
+    # Step 1: Compute one stratum key per row (the value configuration of conditioning_set)
+    if int(np.prod(no_of_categories[conditioning_set], dtype=float)) < 2 ** 62:
+        key = np.zeros(codes.shape[0], dtype=np.int64)
+        for i in conditioning_set:
+            key = key * no_of_categories[i] + codes[:, i]
+        strata, stratum = np.unique(key, return_inverse=True)  # Only the strata that are observed in data
     else:
-        array[i, j].append(value)
+        strata, stratum = np.unique(codes[:, conditioning_set], axis=0, return_inverse=True)
+    no_of_strata = len(strata)
+    stratum = stratum.reshape(-1)
+
+    # Step 2: Generate the contingency tables of all the strata with a single bincount
+    x_size, y_size = no_of_categories[X], no_of_categories[Y]
+    cell = (stratum * x_size + codes[:, X]) * y_size + codes[:, Y]
+    ctables = np.bincount(cell, weights=weights, minlength=no_of_strata * x_size * y_size)
+    ctables = ctables.reshape(no_of_strata, x_size, y_size)
+
+    # Step 3: Calculate chi-square statistic and degree of freedom from the contingency tables
+    row_sum = ctables.sum(axis=2)
+    col_sum = ctables.sum(axis=1)
+    stratum_size = row_sum.sum(axis=1)
+    expected = row_sum[:, :, None] * col_sum[:, None, :] / stratum_size[:, None, None]
+    if G_sq == False:
+        nonzero = expected > 0  # Cells in rows or columns consisted entirely of zeros are left out
+        sum_of_chi_square = np.sum((ctables[nonzero] - expected[nonzero]) ** 2 / expected[nonzero])
+    else:
+        nonzero = ctables > 0  # It guarantees that taking natural log in the next step won't cause any error
+        sum_of_chi_square = 2 * np.sum(ctables[nonzero] * np.log(ctables[nonzero] / expected[nonzero]))
+    sum_of_df = int(np.sum((np.count_nonzero(row_sum, axis=1) - 1) * (np.count_nonzero(col_sum, axis=1) - 1)))
+
+    return sum_of_chi_square, sum_of_df
+
+#######################################################################################################################
+
+class CriticalValues:
+    "Critical values of the Fisher-Z and chi-square statistics at the significance level alpha (each computed once)"
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.z = norm.ppf(1 - alpha)  # p > alpha if and only if sqrt(n - |S| - 3) * |Z| < z
+        self.fisher_z_critical = {}  # map (sample size, |S|) to the critical value of |Z|
+        self.chisq_critical = {}  # map the degree of freedom to the critical value of the chi-square statistic
+
+    def fisherZ(self, sample_size, size_of_S):
+        "Return the critical value of |Z| of a test with the given sample size and size of the conditioning set"
+        key = (sample_size, size_of_S)
+        if key not in self.fisher_z_critical:
+            self.fisher_z_critical[key] = self.z / sqrt(sample_size - size_of_S - 3)
+        return self.fisher_z_critical[key]
+
+    def chisq(self, df):
+        "Return the critical value of the chi-square statistic with df degrees of freedom"
+        if df not in self.chisq_critical:
+            self.chisq_critical[df] = chi2.isf(self.alpha, df)
+        return self.chisq_critical[df]
+
+#######################################################################################################################
+
+class CITestCache:
+    "A bounded (least-recently-used) cache of conditional independence test results"
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size  # maximum number of stored results (0 disables caching)
+        self.results = OrderedDict()  # map (i, j, S) in canonical form to the result of the test
+        self.hits = 0  # number of tests answered from the cache
+        self.misses = 0  # number of tests that had to be computed
+        self.source = None  # the data objects and the sample size the results were computed from (see bind)
+
+    def __deepcopy__(self, memo):
+        "Share the cache between a CausalGraph and its copies (the test results do not depend on the edges)"
+        return self
+
+    def __len__(self):
+        return len(self.results)
+
+    @staticmethod
+    def key(i, j, S):
+        "Return the canonical key of the test of i and j given S (unordered pair, S as a set)"
+        return (i, j, frozenset(S)) if i < j else (j, i, frozenset(S))
+
+    def get(self, i, j, S):
+        "Return the cached result of the test of i and j given S, or None if it has not been cached"
+        key = self.key(i, j, S)
+        result = self.results.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.results.move_to_end(key)
+        return result
+
+    def put(self, i, j, S, result):
+        "Store the result of the test of i and j given S and evict the least recently used results if full"
+        if self.max_size <= 0:
+            return
+        self.results[self.key(i, j, S)] = result
+        while len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+
+    def bind(self, source):
+        "Clear the cache if source (a tuple of the data objects, compared by identity, followed by the sample size) \
+        differs from the source of the cached results, and record it as the source of the results"
+        if self.source is not None and (len(source) != len(self.source) or source[-1] != self.source[-1] or
+                                        any(a is not b for (a, b) in zip(source[:-1], self.source[:-1]))):
+            self.clear()
+        self.source = source
+
+    def clear(self):
+        "Remove all the cached results and reset the counters"
+        self.results.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def hitRate(self):
+        "Return the fraction of tests answered from the cache (nan if no test has been queried)"
+        queries = self.hits + self.misses
+        return self.hits / queries if queries > 0 else float('nan')
+
+#######################################################################################################################
+
+class CITestLog:
+    "A columnar log of conditional independence tests: one row (x, y, S, statistic, p-value) per test, where \
+    the conditioning sets are encoded by their sizes and offsets into one flat array of members"
+
+    def __init__(self):
+        self.blocks = []  # list of (X, Y, S, statistic, p-value) arrays of tests with conditioning sets of equal size
+        self.rows = []  # tests logged one at a time (moved into a block before the next batch is logged)
+        self.unindexed = []  # blocks whose rows have not been grouped by pair yet
+        self.pair_rows = {}  # map each pair (i, j) with i < j to the (block, rows) logged for it but not yet indexed
+        self.index = {}  # map (i, j, S) in canonical form to the logged p-value of the test
+        self.hits = 0  # number of tests answered from the log
+        self.closed = False  # no more tests are logged once closed (the logged ones can still be read)
+
+    def __deepcopy__(self, memo):
+        "Share the log between a CausalGraph and its copies (the test results do not depend on the edges)"
+        return self
+
+    def __len__(self):
+        return sum(len(block[0]) for block in self.blocks) + len(self.rows)
+
+    def append(self, i, j, S, statistic, p=np.nan):
+        "Log the test of i and j given S (p = nan if only the statistic was computed)"
+        if self.closed:
+            return
+        self.rows.append((i, j, tuple(S), statistic, p))
+        if not np.isnan(p):
+            self.index[CITestCache.key(i, j, S)] = p
+
+    def extend(self, X, Y, condition_sets, statistics, p_values=None):
+        "Log the tests of X[k] and Y[k] given condition_sets[k] (non-empty list of sets of equal size) as one block \
+        (p_values = None if only the statistics were computed)"
+        if self.closed:
+            return
+        self.flush()
+        X = np.asarray(X, dtype=np.int32)
+        S = np.asarray(condition_sets, dtype=np.int32).reshape(len(X), len(condition_sets[0]))
+        p_values = np.full(len(X), np.nan) if p_values is None else np.asarray(p_values, dtype=float)
+        self.blocks.append((X, np.asarray(Y, dtype=np.int32), S, np.asarray(statistics, dtype=float), p_values))
+        self.unindexed.append(self.blocks[-1])
+
+    def extendLog(self, log):
+        "Log all the tests logged by another CITestLog"
+        log.flush()
+        self.flush()
+        self.blocks.extend(log.blocks)
+        self.unindexed.extend(log.blocks)
+
+    def close(self):
+        "Stop logging tests"
+        self.flush()
+        self.closed = True
+
+    def flush(self):
+        "Move the tests logged one at a time into blocks (their p-values are already indexed)"
+        sizes = sorted(set(len(row[2]) for row in self.rows))
+        for size in sizes:
+            rows = [row for row in self.rows if len(row[2]) == size]
+            X, Y, condition_sets, statistics, p_values = zip(*rows)
+            S = np.array(condition_sets, dtype=np.int32).reshape(len(rows), size)
+            self.blocks.append((np.array(X, dtype=np.int32), np.array(Y, dtype=np.int32), S,
+                                np.array(statistics, dtype=float), np.array(p_values, dtype=float)))
+        self.rows = []
+
+    def pValue(self, i, j, S):
+        "Return the logged p-value of the test of i and j given S, or None if it has not been logged \
+        (the rows of a pair are indexed when the pair is first queried)"
+        for block in self.unindexed:
+            X, Y, condition_sets, statistics, p_values = block
+            rows = np.where(~np.isnan(p_values))[0]
+            pair_codes = np.minimum(X[rows], Y[rows]).astype(np.int64) << 32 | np.maximum(X[rows], Y[rows])
+            order = np.argsort(pair_codes, kind='stable')
+            pairs, starts = np.unique(pair_codes[order], return_index=True)
+            for pair, group in zip(pairs.tolist(), np.split(rows[order], starts[1:])):
+                self.pair_rows.setdefault((pair >> 32, pair & 0xFFFFFFFF), []).append((block, group))
+        self.unindexed = []
+        for (block, rows) in self.pair_rows.pop((min(i, j), max(i, j)), []):
+            for k, p_k in zip(rows.tolist(), block[4][rows].tolist()):
+                self.index[CITestCache.key(i, j, block[2][k].tolist())] = p_k
+        p = self.index.get(CITestCache.key(i, j, S))
+        if p is not None:
+            self.hits += 1
+        return p
+
+    def columns(self):
+        "Return the log as a dict of np.ndarray columns x, y, set_size, set_offset, statistic and p_value, where \
+        the members of the k-th conditioning set are set_members[set_offset[k]: set_offset[k] + set_size[k]]"
+        self.flush()
+        if len(self.blocks) == 0:
+            empty = np.zeros(0, dtype=np.int32)
+            return {"x": empty, "y": empty, "set_size": empty, "set_offset": np.zeros(0, dtype=np.int64),
+                    "set_members": empty, "statistic": np.zeros(0), "p_value": np.zeros(0)}
+        set_size = np.concatenate([np.full(len(block[0]), block[2].shape[1], dtype=np.int32)
+                                   for block in self.blocks])
+        return {"x": np.concatenate([block[0] for block in self.blocks]),
+                "y": np.concatenate([block[1] for block in self.blocks]),
+                "set_size": set_size,
+                "set_offset": np.concatenate(([0], np.cumsum(set_size, dtype=np.int64)[:-1])),
+                "set_members": np.concatenate([block[2].reshape(-1) for block in self.blocks]),
+                "statistic": np.concatenate([block[3] for block in self.blocks]),
+                "p_value": np.concatenate([block[4] for block in self.blocks])}
+
+#######################################################################################################################
+
+class SepsetStore:
+    "The separating sets of the pairs of variables, stored once per unordered pair in flat arrays indexed by the pair: \
+    the first set of each pair as a bitmask (see setMask) if there are at most 64 variables, and as a sorted run of \
+    node indices in one compact array otherwise; the rarer further sets of a pair are kept as bitmasks in a dict"
+
+    def __init__(self, no_of_var):
+        self.no_of_var = no_of_var
+        no_of_pairs = no_of_var * (no_of_var - 1) // 2
+        self.separated = np.zeros(no_of_pairs, dtype=bool)  # whether each pair has a separating set
+        if no_of_var <= 64:
+            self.first_mask = np.zeros(no_of_pairs, dtype=np.uint64)  # bitmask of the first set of each pair
+        else:
+            self.first_start = np.zeros(no_of_pairs, dtype=np.int64)  # offset of the first set of each pair in members
+            self.first_size = np.zeros(no_of_pairs, dtype=np.uint16)  # size of the first set of each pair
+            self.members = array('H' if no_of_var <= 65536 else 'i')  # the sorted members of the first sets
+        self.more = {}  # map the index of each pair with more than one separating set to the bitmasks of the others
+
+    def __len__(self):
+        return int(np.count_nonzero(self.separated))
+
+    def pairIndex(self, i, j):
+        "Return the index of the unordered pair of i and j (i != j) in the arrays of the store"
+        i, j = (int(i), int(j)) if i < j else (int(j), int(i))
+        return i * self.no_of_var - i * (i + 1) // 2 + j - i - 1
+
+    def firstMask(self, index):
+        "Return the bitmask of the first separating set of the pair at index (which must be separated)"
+        if self.no_of_var <= 64:
+            return int(self.first_mask[index])
+        start = int(self.first_start[index])
+        return setMask(self.members[start:start + int(self.first_size[index])])
+
+    def add(self, i, j, S):
+        "Record S (iterable of nodes) as a separating set of i and j (sets already recorded for the pair are skipped)"
+        index = self.pairIndex(i, j)
+        mask = setMask(S)
+        if not self.separated[index]:
+            self.separated[index] = True
+            if self.no_of_var <= 64:
+                self.first_mask[index] = mask
+            else:
+                self.first_start[index] = len(self.members)
+                self.first_size[index] = len(S)
+                self.members.extend(maskMembers(mask))
+        elif mask != self.firstMask(index) and mask not in self.more.get(index, ()):
+            self.more.setdefault(index, []).append(mask)
+
+    def masks(self, i, j):
+        "Return the list of the bitmasks of the separating sets of i and j (in the order they were recorded)"
+        index = self.pairIndex(i, j)
+        if not self.separated[index]:
+            return []
+        return [self.firstMask(index)] + self.more.get(index, [])
+
+    def contains(self, i, j, k):
+        "Return True if k is in some separating set of i and j"
+        index = self.pairIndex(i, j)
+        if not self.separated[index]:
+            return False
+        bit = 1 << int(k)
+        if self.no_of_var <= 64:
+            found = int(self.first_mask[index]) & bit
+        else:
+            start = int(self.first_start[index])
+            found = int(k) in self.members[start:start + int(self.first_size[index])]
+        return bool(found) or any(mask & bit for mask in self.more.get(index, ()))
+
+    def __getitem__(self, pair):
+        "Return the list of the separating sets of the pair (i, j) as sorted tuples, or None if it has none"
+        masks = self.masks(*pair)
+        return [maskMembers(mask) for mask in masks] if len(masks) > 0 else None
+
+    def items(self):
+        "Yield (i, j, masks) with i < j for each pair with separating sets"
+        rows, columns = np.triu_indices(self.no_of_var, 1)  # the pairs in the order of their indices
+        for index in np.where(self.separated)[0]:
+            i, j = int(rows[index]), int(columns[index])
+            yield i, j, self.masks(i, j)
 
 #######################################################################################################################
 
@@ -107,12 +404,23 @@ def powerset(L):
 
 #######################################################################################################################
 
-def cartesian_product(lists):
-    "Return the Cartesian product of lists (List of lists)"
-    result = [[]]
-    for pool in lists:
-        result = [x + [y] for x in result for y in pool]
-    return result
+def setMask(S):
+    "Return the canonical integer bitmask of the set of nodes S (iterable), in which bit v is set if v is in S"
+    mask = 0
+    for v in S:
+        mask |= 1 << int(v)
+    return mask
+
+#######################################################################################################################
+
+def maskMembers(mask):
+    "Return the nodes of the set encoded by mask (see setMask) as a sorted tuple"
+    members = []
+    while mask:
+        lowest = mask & -mask
+        members.append(lowest.bit_length() - 1)
+        mask ^= lowest
+    return tuple(members)
 
 #######################################################################################################################
 
@@ -235,25 +543,20 @@ def isAdj(adjmat, i, j):
 
 def findUnshieldedTriples(adjmat):
     "Return the list of unshielded triples i o-o j o-o k as (i, j, k) from the adjacency matrix adjmat (np.ndarray)"
-    return [(pair[0][0], pair[0][1], pair[1][1]) for pair in permutations(findAdj(adjmat), 2)
-            if pair[0][1] == pair[1][0] and pair[0][0] != pair[1][1] and adjmat[pair[0][0], pair[1][1]] == -1]
+    return GraphMotifs.findUnshieldedTriples(adjmat)
 
 #######################################################################################################################
 
 def findTriangles(adjmat):
     "Return the list of non-ambiguous triangles i o-o j o-o k o-o i as (i, j, k) from the adjacency matrix adjmat (np.ndarray)"
-    Adj = findAdj(adjmat)
-    return [(pair[0][0], pair[0][1], pair[1][1]) for pair in permutations(Adj, 2)
-            if pair[0][1] == pair[1][0] and pair[0][0] != pair[1][1] and (pair[0][0], pair[1][1]) in Adj]
+    return GraphMotifs.findTriangles(adjmat)
 
 #######################################################################################################################
 
 def findKites(graph):
     "Return the list of non-ambiguous kites i o-o j o-o l o-o k o-o i o-o l (where j and k are non-adjacent)\
     as (i, j, k, l) from the adjacency matrix adjmat (np.ndarray)"
-    return [(pair[0][0], pair[0][1], pair[1][1], pair[0][2]) for pair in permutations(findTriangles(graph), 2)
-            if pair[0][0] == pair[1][0] and pair[0][2] == pair[1][2]
-            and pair[0][1] < pair[1][1] and graph[pair[0][1], pair[1][1]] == -1]
+    return GraphMotifs.findKites(graph)
 
 #######################################################################################################################
 
@@ -282,21 +585,13 @@ def findConditioningSetsWithoutMiddle(adjmat, x, y, z):
 def findUC(adjmat):
     "Return the list of unshielded colliders x --> y <-- z as (x, y, z) in the adjacency matrix adjmat (np.ndarray)\
     with asymmetry x < z"
-    directed = findFullyDirected(adjmat)
-    return [(pair[0][0], pair[0][1], pair[1][0]) for pair in permutations(directed, 2)
-            if pair[0][1] == pair[1][1] and pair[0][0] < pair[1][0] and adjmat[pair[0][0], pair[1][0]] == -1]
+    return GraphMotifs.findUC(adjmat)
 
 #######################################################################################################################
 
 def rearrangeColumns(adjmat, PATH):
     "Rearrange the adjacency matrix adjmat (np.ndarray) according to the data imported at PATH"
-    raw_col_names = list(pd.read_csv(PATH, sep='\t').columns)
-    var_indices = []
-    for name in raw_col_names:
-        var_indices.append(int(name.split('X')[1]) - 1)
-    new_indices = np.zeros_like(var_indices)
-    for i in range(1, len(new_indices)):
-        new_indices[var_indices[i]] = range(len(new_indices))[i]
+    new_indices = columnOrder(columnNames(PATH))  # only the header (or the data cache) is read
     output = adjmat[:, new_indices]
     output = output[new_indices, :]
     return output
@@ -373,18 +668,19 @@ def drawGraph(nx_graph):
 
 def isDSep(nx_graph, x, y, Z):
     "Return True if x and y are d-separated by the set Z in nx_graph (networkx graph object) and False otherwise"
-    S = set([str(i) for i in Z])
-    return nx.d_separated(nx_graph, {str(x)}, {str(y)}, S)
+    from DSeparation import DSeparation  # imported here since DSeparation uses the bitmask functions of this module
+    d_sep = DSeparation.fromNxGraph(nx_graph)
+    return d_sep.isDSep(d_sep.index[str(x)], d_sep.index[str(y)], [d_sep.index[str(i)] for i in Z])
 
 #######################################################################################################################
 
 def tetrad2adjmat(path):
     "Convert the graph (.txt output by TETRAD) at path into an adjacency matrix (np.ndarray)"
     tetrad_file = pd.read_csv(path, sep='\t')
-    if ',' in str(tetrad_file.loc[0][0]):
-        var_names = str(tetrad_file.loc[0][0]).split(',')
-    elif ';' in str(tetrad_file.loc[0][0]):
-        var_names = str(tetrad_file.loc[0][0]).split(';')
+    if ',' in str(tetrad_file.iloc[0, 0]):
+        var_names = str(tetrad_file.iloc[0, 0]).split(',')
+    elif ';' in str(tetrad_file.iloc[0, 0]):
+        var_names = str(tetrad_file.iloc[0, 0]).split(';')
 
     adjmat = np.eye(len(var_names), len(var_names))
     adjmat[adjmat == 1] = None
@@ -393,7 +689,7 @@ def tetrad2adjmat(path):
     bidirected = 0
 
     for i in range(2, tetrad_file.shape[0]):
-        STR = str(tetrad_file.loc[i][0])
+        STR = str(tetrad_file.iloc[i, 0])
         if '-->' in STR:
             STR_truncated = STR.split('. ')[1].split(' --> ')
             LEFT = int(STR_truncated[0].split('X')[1]) - 1
@@ -0,0 +1,150 @@
+#######################################################################################################################
+import numpy as np
+import time
+from DataLoader import CovarianceAccumulator
+from GraphClass import CausalGraph
+from Helper import CITestCache
+from PC import orientEdges
+from PC_Algorithm_Phase1 import discoverSkeleton
+#######################################################################################################################
+
+
+class IncrementalPC:
+    """PC algorithm on a data set that grows by batches of rows. Only the sufficient statistics of the data are kept
+    (the co-moments for Fisher-Z's test and the counts of the distinct rows for the chi-square tests), and after each
+    batch the p-values of the previous runs are reused for the tests whose decisions were far from alpha, so that only
+    the tests near the boundary and the tests that were never run are computed again"""
+
+    def __init__(self, alpha, test_name, stable=True, uc_rule=0, uc_priority=-1, margin=10, max_growth=2,
+                 cache_size=1000000):
+        """
+        :param alpha: desired significance level in (0, 1) (float)
+        :param test_name: name of the independence test being used ("Fisher_Z", "Chi_sq" or "G_sq")
+        :param stable: run stabilized skeleton discovery if True (default = True)
+        :param uc_rule: how unshielded colliders are oriented (see PC.pcAlgorithm; default = 0)
+        :param uc_priority: rule of resolving conflicts between unshielded colliders (see PC.pcAlgorithm; default = -1)
+        :param margin: a p-value p is reused only if p < alpha / margin or p > alpha * margin (default = 10);
+               float('inf') runs all the tests again after each batch
+        :param max_growth: a p-value is reused only until the sample size exceeds max_growth times the sample size at
+               which it was computed (default = 2)
+        :param cache_size: maximum number of p-values kept for reuse (default = 1000000)
+        """
+        assert 0 < alpha < 1
+        assert test_name in ["Fisher_Z", "Chi_sq", "G_sq"]
+        assert margin >= 1 and max_growth >= 1
+        self.alpha = alpha
+        self.test_name = test_name
+        self.stable = stable
+        self.uc_rule = uc_rule
+        self.uc_priority = uc_priority
+        self.margin = margin
+        self.max_growth = max_growth
+        self.cache_size = cache_size
+        self.moments = None  # store the CovarianceAccumulator of the rows (for Fisher-Z's test)
+        self.configurations = None  # store the distinct rows (for the chi-square tests)
+        self.counts = None  # store the number of occurrences of each distinct row
+        self.cg = None  # store the CausalGraph estimated from all the rows absorbed so far
+        self.tested_at = {}  # map each cached test to the sample size at which its p-value was computed
+        self.tests_reused = 0  # number of p-values reused in the last update
+        self.tests_computed = 0  # number of tests run in the last update
+
+    ####################################################################################################################
+
+    def sampleSize(self):
+        """Return the number of rows absorbed so far"""
+        if self.moments is not None:
+            return self.moments.sample_size
+        return int(self.counts.sum()) if self.counts is not None else 0
+
+    ####################################################################################################################
+
+    def absorb(self, rows):
+        """Add rows (np.ndarray of shape (rows, no_of_var)) to the sufficient statistics"""
+        rows = np.asarray(rows, dtype=float)
+        if self.test_name == "Fisher_Z":
+            if self.moments is None:
+                self.moments = CovarianceAccumulator(rows.shape[1])
+            self.moments.update(rows)
+        else:
+            weights = np.ones(rows.shape[0])
+            if self.configurations is not None:
+                rows = np.concatenate((self.configurations, rows))
+                weights = np.concatenate((self.counts, weights))
+            self.configurations, inverse = np.unique(rows, axis=0, return_inverse=True)
+            self.counts = np.bincount(inverse.reshape(-1), weights=weights).astype(np.int64)
+
+    ####################################################################################################################
+
+    def reusableCache(self):
+        """Return a CITestCache holding the p-values of the previous runs that are far from alpha and not too old"""
+        ci_cache = CITestCache(self.cache_size)
+        if self.cg is None:
+            return ci_cache
+        sample_size = self.sampleSize()
+        for (i, j, S), p in self.cg.ci_cache.results.items():
+            far = p < self.alpha / self.margin or p > self.alpha * self.margin
+            if far and sample_size <= self.max_growth * self.tested_at[(i, j, S)]:
+                ci_cache.put(i, j, S, p)
+        return ci_cache
+
+    ####################################################################################################################
+
+    def update(self, rows):
+        """Absorb a batch of rows and update the estimated graph
+        :param rows: new rows of the data set (np.ndarray of shape (rows, no_of_var))
+        :return:
+        cg: the CausalGraph object estimated from all the rows absorbed so far
+        diff: the changes from the previous graph (see graphDiff)
+        """
+        start = time.time()
+        self.absorb(rows)
+        ci_cache = self.reusableCache()
+        reused = set(ci_cache.results.keys())
+
+        cg_1 = CausalGraph(len(self.moments.mean) if self.moments is not None else self.configurations.shape[1])
+        cg_1.setTestName(self.test_name)
+        if self.test_name == "Fisher_Z":
+            cg_1.sample_size = self.moments.sample_size
+            cg_1.cov_mat = self.moments.covariance()
+            cg_1.corr_mat = self.moments.correlation()
+        else:
+            cg_1.data = self.configurations
+            cg_1.data_weights = self.counts
+            cg_1.corr_mat = []
+        cg_1.adoptCache(ci_cache)
+        discoverSkeleton(cg_1, self.alpha, self.stable)
+        cg = orientEdges(cg_1, self.alpha, self.uc_rule, self.uc_priority)
+        cg.PC_elapsed = time.time() - start
+
+        sample_size = self.sampleSize()
+        self.tested_at = {key: self.tested_at[key] if key in reused else sample_size for key in ci_cache.results}
+        self.tests_reused = len(reused)
+        self.tests_computed = len(self.tested_at.keys() - reused)
+        diff = graphDiff(self.cg, cg)
+        self.cg = cg
+        return cg, diff
+
+#######################################################################################################################
+
+
+def graphDiff(cg_old, cg_new):
+    """Return the changes from cg_old to cg_new (CausalGraph objects over the same variables; cg_old = None stands for
+    the empty graph) as a dict of lists of pairs (i, j) with i < j:
+    "added": adjacencies of cg_new that are not in cg_old
+    "removed": adjacencies of cg_old that are not in cg_new
+    "reoriented": adjacencies of both whose edge marks differ"""
+    new = cg_new.adjmat
+    old = cg_old.adjmat if cg_old is not None else np.where(np.isnan(new), np.nan, -1)
+    adjacent_old = (old == 0) | (old == 1)
+    adjacent_new = (new == 0) | (new == 1)
+    marks_differ = (old != new) | (old.T != new.T)
+    upper = np.triu(np.ones(new.shape, dtype=bool), 1)
+
+    def pairs(mask):
+        return [(int(i), int(j)) for (i, j) in zip(*np.where(mask & upper))]
+
+    return {"added": pairs(adjacent_new & ~adjacent_old),
+            "removed": pairs(adjacent_old & ~adjacent_new),
+            "reoriented": pairs(adjacent_old & adjacent_new & marks_differ)}
+
+#######################################################################################################################
@@ -1,9 +1,12 @@
 #######################################################################################################################
 import PC_Algorithm_Phase1, PC_Algorithm_Phase2, PC_Algorithm_Phase3, time
+import numpy as np
+from DataLoader import streamStatistics
 #######################################################################################################################
 
 
-def pcAlgorithm(data, alpha, test_name, stable, uc_rule, uc_priority):
+def pcAlgorithm(data, alpha, test_name, stable, uc_rule, uc_priority, n_jobs=1, decision_only=False,
+                log_tests=False, set_order="index", max_cond_size=None):
     """
     :param data: data set (numpy ndarray)
     :param alpha: desired significance level (float) in (0, 1)
@@ -23,37 +26,170 @@ def pcAlgorithm(data, alpha, test_name, stable, uc_rule, uc_priority):
            2. prioritize existing colliders
            3. prioritize stronger colliders
            4. prioritize stronger* colliers
+    :param n_jobs: number of worker processes used by stabilized skeleton discovery (default = 1)
+    :param decision_only: skip the p-values of the tests in skeleton discovery if True (default = False)
+    :param log_tests: log the tests of skeleton discovery so that the orientation rules reuse their p-values if True
+           (default = False)
+    :param set_order: order in which skeleton discovery tries the conditioning sets of each pair
+           (see PC_Algorithm_Phase1.skeletonDiscovery; default = "index")
+    :param max_cond_size: largest conditioning set compared by the orientation rules (default = None: no limit)
     :return:
     cg: a CausalGraph object
     """
     start = time.time()
-    cg_1 = PC_Algorithm_Phase1.skeletonDiscovery(data, alpha, test_name, stable)
+    cg_1 = PC_Algorithm_Phase1.skeletonDiscovery(data, alpha, test_name, stable, n_jobs=n_jobs,
+                                                 decision_only=decision_only, log_tests=log_tests,
+                                                 set_order=set_order)
+    cg = orientEdges(cg_1, alpha, uc_rule, uc_priority, max_cond_size)
+    end = time.time()
+
+    cg.PC_elapsed = end - start
+
+    return cg
+
+#######################################################################################################################
+
+
+def pcAlgorithmFromCovariance(cov_mat, sample_size, alpha, stable, uc_rule, uc_priority, n_jobs=1,
+                              decision_only=False, log_tests=False, set_order="index", max_cond_size=None):
+    """Run PC algorithm with Fisher-Z's test from the covariance (or correlation) matrix of the data and the sample
+    size alone, without the data set
+    :param cov_mat: covariance or correlation matrix of the variables (numpy ndarray)
+    :param sample_size: number of samples from which cov_mat was computed (int)
+    :param alpha, stable, uc_rule, uc_priority, n_jobs, decision_only, log_tests, set_order, max_cond_size:
+           see pcAlgorithm
+    :return:
+    cg: a CausalGraph object
+    """
+    start = time.time()
+    cg_1 = PC_Algorithm_Phase1.skeletonDiscoveryFromCovariance(cov_mat, sample_size, alpha, stable, n_jobs=n_jobs,
+                                                               decision_only=decision_only, log_tests=log_tests,
+                                                               set_order=set_order)
+    cg = orientEdges(cg_1, alpha, uc_rule, uc_priority, max_cond_size)
+    end = time.time()
+
+    cg.PC_elapsed = end - start
+
+    return cg
+
+#######################################################################################################################
+
+
+def pcAlgorithmFromFiles(paths, alpha, stable, uc_rule, uc_priority, chunk_size=100000, n_jobs=1,
+                         decision_only=False, log_tests=False, set_order="index", max_cond_size=None):
+    """Run PC algorithm with Fisher-Z's test on the data in the files at paths without loading them into memory: the
+    rows are streamed in chunks into the correlation matrix, which is passed to pcAlgorithmFromCovariance
+    :param paths: path (string) or list of paths of data files whose rows are concatenated (see streamStatistics)
+    :param chunk_size: maximum number of rows held in memory at a time (default = 100000)
+    :param alpha, stable, uc_rule, uc_priority, n_jobs, decision_only, log_tests, set_order, max_cond_size:
+           see pcAlgorithm
+    :return:
+    cg: a CausalGraph object (its variables are in the column order of the first file)
+    """
+    start = time.time()
+    corr_mat, sample_size, column_names = streamStatistics(paths, chunk_size)
+    cg = pcAlgorithmFromCovariance(corr_mat, sample_size, alpha, stable, uc_rule, uc_priority, n_jobs=n_jobs,
+                                   decision_only=decision_only, log_tests=log_tests, set_order=set_order,
+                                   max_cond_size=max_cond_size)
+    cg.PC_elapsed = time.time() - start
 
+    return cg
+
+#######################################################################################################################
+
+
+def orientEdges(cg_1, alpha, uc_rule, uc_priority, max_cond_size=None):
+    """Orient the skeleton cg_1 (a CausalGraph object) by the rule uc_rule with priority uc_priority
+    (see pcAlgorithm) followed by Meek rules, comparing conditioning sets of at most max_cond_size nodes
+    (default = None: no limit)
+    :return:
+    cg: a CausalGraph object
+    """
     if uc_rule == 0:
         if uc_priority != -1:
-            cg_2 = PC_Algorithm_Phase2.uc_sepset(cg_1, uc_priority)
+            cg_2 = PC_Algorithm_Phase2.uc_sepset(cg_1, uc_priority, max_cond_size=max_cond_size)
         else:
-            cg_2 = PC_Algorithm_Phase2.uc_sepset(cg_1)
+            cg_2 = PC_Algorithm_Phase2.uc_sepset(cg_1, max_cond_size=max_cond_size)
         cg = PC_Algorithm_Phase3.Meek(cg_2)
 
     elif uc_rule == 1:
         if uc_priority != -1:
-            cg_2 = PC_Algorithm_Phase2.maxP(cg_1, uc_priority)
+            cg_2 = PC_Algorithm_Phase2.maxP(cg_1, uc_priority, max_cond_size=max_cond_size)
         else:
-            cg_2 = PC_Algorithm_Phase2.maxP(cg_1)
+            cg_2 = PC_Algorithm_Phase2.maxP(cg_1, max_cond_size=max_cond_size)
         cg = PC_Algorithm_Phase3.Meek(cg_2)
 
     elif uc_rule == 2:
         if uc_priority != -1:
-            cg_2 = PC_Algorithm_Phase2.definiteMaxP(cg_1, alpha, uc_priority)
+            cg_2 = PC_Algorithm_Phase2.definiteMaxP(cg_1, alpha, uc_priority, max_cond_size=max_cond_size)
         else:
-            cg_2 = PC_Algorithm_Phase2.definiteMaxP(cg_1, alpha)
+            cg_2 = PC_Algorithm_Phase2.definiteMaxP(cg_1, alpha, max_cond_size=max_cond_size)
         cg_before = PC_Algorithm_Phase3.definite_Meek(cg_2)
         cg = PC_Algorithm_Phase3.Meek(cg_before)
-    end = time.time()
-
-    cg.PC_elapsed = end - start
 
     return cg
 
 #######################################################################################################################
+
+
+def pcAlgorithmSweep(data, alphas, test_name, stable, uc_rule, uc_priority, truth=None, compare_pattern=True,
+                     adj_only=False, uc_also=True, set_order="index", max_cond_size=None):
+    """Run PC algorithm at each significance level in alphas with one pass of skeleton discovery: the p-values do not
+    depend on alpha, so skeleton discovery is run once at max(alphas) with its tests logged, the skeleton and sepsets
+    at each smaller alpha are derived from the p-values of the logged tests (see PC_Algorithm_Phase1.skeletonFromLog),
+    and the edges of each skeleton are oriented at its alpha
+    :param data: data set (numpy ndarray)
+    :param alphas: ascending list of desired significance levels in (0, 1) (floats)
+    :param test_name: name of the independence test being used (see pcAlgorithm)
+    :param stable: run stabilized skeleton discovery if True
+    :param uc_rule: how unshielded colliders are oriented (see pcAlgorithm)
+    :param uc_priority: rule of resolving conflicts between unshielded colliders (see pcAlgorithm)
+    :param truth: the true DAG (a CausalGraph object) which each estimated graph is compared with (default = None)
+    :param compare_pattern: compare with the true pattern if True and with the true DAG otherwise (default = True)
+    :param adj_only: return only adjacency-related performance statistics if True (default = False)
+    :param uc_also: return unshielded colliders-related performance statistics if True (default = True)
+    :param set_order, max_cond_size: see pcAlgorithm
+    :return:
+    cg_list: list of CausalGraph objects (one per alpha in alphas; the one at max(alphas) is the result of pcAlgorithm)
+    edge_alpha: np.ndarray where edge_alpha[i, j] is the smallest alpha in alphas at which i o-o j survives
+                skeleton discovery (nan if it never does), i.e., at which no logged test of i and j has p > alpha;
+                edges are removed when p > alpha, so they survive more often as alpha grows
+    stat_list: np.ndarray of the performance statistics of CausalGraph.comparison followed by the elapsed time
+               (the time of skeleton discovery plus that of orienting the edges at alpha), one row per alpha
+               (None if truth is None)
+    """
+    assert len(alphas) > 0
+    assert all(alphas[k] < alphas[k + 1] for k in range(len(alphas) - 1))
+
+    start = time.time()
+    cg_max = PC_Algorithm_Phase1.skeletonDiscovery(data, alphas[-1], test_name, stable, log_tests=True,
+                                                   set_order=set_order)
+    skeleton_elapsed = time.time() - start
+
+    log = cg_max.ci_log.columns()
+    no_of_var = data.shape[1]
+    max_p = np.full((no_of_var, no_of_var), -np.inf)  # the largest p-value of the logged tests of each pair
+    np.maximum.at(max_p, (log["x"], log["y"]), log["p_value"])
+    max_p = np.maximum(max_p, max_p.T)
+    edge_alpha = np.full((no_of_var, no_of_var), np.nan)
+    for alpha in alphas[::-1]:
+        edge_alpha[max_p <= alpha] = alpha
+    np.fill_diagonal(edge_alpha, np.nan)
+
+    cg_list = []
+    stat_list = []
+    for alpha in alphas:
+        start = time.time()
+        cg_1 = cg_max if alpha == alphas[-1] else PC_Algorithm_Phase1.skeletonFromLog(cg_max, alpha)
+        cg = orientEdges(cg_1, alpha, uc_rule, uc_priority, max_cond_size)
+        cg.PC_elapsed = skeleton_elapsed + time.time() - start
+
+        cg_list.append(cg)
+        if truth is not None:
+            stat = cg.comparison(truth, compare_pattern, adj_only, uc_also, print_to_console=False)
+            stat.append(cg.PC_elapsed)
+            stat_list.append(stat)
+
+    return cg_list, edge_alpha, np.array(stat_list) if truth is not None else None
+
+#######################################################################################################################
@@ -1,12 +1,19 @@
 #######################################################################################################################
 import numpy as np
 from GraphClass import CausalGraph
-from Helper import appendValue
-from itertools import permutations, combinations
+from Helper import fisherZPValue, maskMembers, CITestLog, CITestCache, SepsetStore
+from itertools import permutations, combinations, islice
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
 #######################################################################################################################
 
+SET_ORDERS = ["index", "association", "sepset"]  # the orders in which conditioning sets can be tried
 
-def skeletonDiscovery(data, alpha, test_name, stable=True):
+#######################################################################################################################
+
+
+def skeletonDiscovery(data, alpha, test_name, stable=True, batch_size=10000, n_jobs=1, decision_only=False,
+                      log_tests=False, ci_cache=None, set_order="index"):
     """Perform skeleton discovery
     :param data: data set (numpy ndarray)
     :param alpha: desired significance level in (0, 1) (float)
@@ -15,49 +22,573 @@ def skeletonDiscovery(data, alpha, test_name, stable=True):
            - "Chi_sq": Chi-squared conditional independence test
            - "G_sq": G-squared conditional independence test
     :param stable: run stabilized skeleton discovery if True (default = True)
+    :param batch_size: maximum number of Fisher-Z tests evaluated in one batch by stabilized skeleton discovery
+           (default = 10000)
+    :param n_jobs: number of worker processes testing the pairs of each depth (default = 1);
+           requires stable = True and gives the same result for any number of workers
+    :param decision_only: decide each test by comparing its statistic with the critical value at alpha instead of
+           computing its p-value if True (default = False); the tests are then not recorded in cg.ci_cache
+    :param log_tests: log every test run (pair, conditioning set, statistic and p-value) in cg.ci_log if True
+           (default = False); the orientation rules then read the logged p-values instead of running the tests again
+           (only the statistics are logged if decision_only = True)
+    :param ci_cache: a CITestCache holding the p-values of earlier runs on the same data and test (e.g., at other
+           significance levels), which is used as cg.ci_cache so that those tests are not run again (default = None)
+    :param set_order: order in which the conditioning sets of each pair are tried (see SET_ORDERS; default = "index")
+           - "index": combinations of the neighbors in ascending order
+           - "association": the neighbors most associated with both variables of the pair come first
+           - "sepset": the neighbors found most often in the separating sets of the earlier depths of pairs sharing
+             a variable with the pair come first (ties broken by association)
+           The numbers of tests run and of tests up to the first separating set of each pair at each depth are
+           recorded in cg.skeleton_tests and cg.skeleton_tests_needed (see compareSetOrders)
     :return:
     cg: a CausalGraph object
     """
-    assert type(data) == np.ndarray
+    assert isinstance(data, np.ndarray)  # including the read-only memory maps of DataLoader.loadData
     assert 0 < alpha < 1
     assert test_name in ["Fisher_Z", "Chi_sq", "G_sq"]
+    assert n_jobs >= 1
+    assert stable or n_jobs == 1
 
     no_of_var = data.shape[1]
     cg = CausalGraph(no_of_var)
     cg.data = data
+    cg.sample_size = data.shape[0]
     cg.setTestName(test_name)
     cg.corr_mat = np.corrcoef(data, rowvar=False) if test_name == "Fisher_Z" else []
+    if ci_cache is not None:
+        cg.adoptCache(ci_cache)
+    return discoverSkeleton(cg, alpha, stable, batch_size, n_jobs, decision_only, log_tests, set_order)
+
+#######################################################################################################################
+
+
+def skeletonDiscoveryFromCovariance(cov_mat, sample_size, alpha, stable=True, batch_size=10000, n_jobs=1,
+                                    decision_only=False, log_tests=False, ci_cache=None, set_order="index"):
+    """Perform skeleton discovery with Fisher-Z's test from the covariance (or correlation) matrix of the data and
+    the sample size alone, without the data set
+    :param cov_mat: covariance or correlation matrix of the variables (numpy ndarray)
+    :param sample_size: number of samples from which cov_mat was computed (int)
+    :param alpha: desired significance level in (0, 1) (float)
+    :param stable, batch_size, n_jobs, decision_only, log_tests, ci_cache, set_order: see skeletonDiscovery
+    :return:
+    cg: a CausalGraph object (with cg.data = None)
+    """
+    cov_mat = np.asarray(cov_mat, dtype=float)
+    assert cov_mat.ndim == 2 and cov_mat.shape[0] == cov_mat.shape[1]
+    assert np.allclose(cov_mat, cov_mat.T) and np.all(np.diag(cov_mat) > 0)
+    assert sample_size > 3
+    assert 0 < alpha < 1
+    assert n_jobs >= 1
+    assert stable or n_jobs == 1
+
+    cg = CausalGraph(cov_mat.shape[0])
+    cg.sample_size = int(sample_size)
+    cg.setTestName("Fisher_Z")
+    cg.cov_mat = cov_mat
+    std = np.sqrt(np.diag(cov_mat))
+    cg.corr_mat = cov_mat / np.outer(std, std)
+    np.fill_diagonal(cg.corr_mat, 1)
+    if ci_cache is not None:
+        cg.adoptCache(ci_cache)
+    return discoverSkeleton(cg, alpha, stable, batch_size, n_jobs, decision_only, log_tests, set_order)
+
+#######################################################################################################################
+
+
+def discoverSkeleton(cg, alpha, stable=True, batch_size=10000, n_jobs=1, decision_only=False, log_tests=False,
+                     set_order="index"):
+    """Remove the edges of the complete graph cg (a CausalGraph object with its test and statistics set) between the
+    pairs of variables found conditionally independent, and record their separating sets in cg.sepset
+    (see skeletonDiscovery for the parameters)
+    :return:
+    cg: the CausalGraph object
+    """
+    assert set_order in SET_ORDERS
+    test_name = cg.test
+    no_of_var = cg.adjmat.shape[0]
+    cg.ci_log = CITestLog() if log_tests else None
+    cg.tests_run = 0
+    cg.tests_needed = 0
+    cg.skeleton_tests = []
+    cg.skeleton_tests_needed = []
+    cg.attachCore()  # neighbors and degrees are looked up in O(1) while edges are removed
 
     node_ids = range(no_of_var)
     pair_of_variables = list(permutations(node_ids, 2))
 
+    if n_jobs > 1:
+        parallelSkeleton(cg, pair_of_variables, alpha, batch_size, n_jobs, decision_only, set_order)
+        cg.detachCore()
+        if cg.ci_log is not None:
+            cg.ci_log.close()  # the orientation rules only read the tests of skeleton discovery
+        return cg
+
+    orders = SetOrders(cg, set_order)
     depth = -1
     while cg.maxDegree() - 1 > depth:
         depth += 1
+        tests_before = cg.tests_run
+        needed_before = cg.tests_needed
         edge_removal = []
-        for (x, y) in pair_of_variables:
-            Neigh_x = cg.neighbors(x)
-            if y not in Neigh_x:
-                continue
-            else:
-                Neigh_x = np.delete(Neigh_x, np.where(Neigh_x == y))
-
-            if len(Neigh_x) >= depth:
-                for S in combinations(Neigh_x, depth):
-                    p = cg.ci_test(x, y, S)
-                    if p > alpha:
-                        if not stable:  # Unstable: Remove x---y right away
-                            cg.adjmat[x, y] = -1
-                            cg.adjmat[y, x] = -1
-                        else:  # Stable: x---y will be removed only
-                            edge_removal.append((x, y))  # after all conditioning sets at
-                            edge_removal.append((y, x))  # depth l have been considered
-                            appendValue(cg.sepset, x, y, S)
-                            appendValue(cg.sepset, y, x, S)
-                        break
+        if depth > 0:
+            orders.update()
+        if stable and test_name == "Fisher_Z" and depth <= 1:  # Stable: depths 0 and 1 have closed forms
+            for (x, y, S) in closedFormSepsets(cg, depth, alpha, decision_only, orders):
+                edge_removal.append((x, y))
+                edge_removal.append((y, x))
+                cg.sepset.add(x, y, S)
+        elif stable:  # Stable: all the pairs at depth l can be tested in batches
+            for (x, y, S) in searchSepsets(cg, pair_of_variables, depth, alpha, batch_size, decision_only, orders):
+                edge_removal.append((x, y))
+                edge_removal.append((y, x))
+                cg.sepset.add(x, y, S)
+        else:
+            for (x, y) in pair_of_variables:
+                Neigh_x = cg.neighbors(x)
+                if y not in Neigh_x:
+                    continue
+                else:
+                    Neigh_x = np.delete(Neigh_x, np.where(Neigh_x == y))
+
+                if len(Neigh_x) >= depth:
+                    for S in combinations(orders.neighbors(x, y, Neigh_x), depth):
+                        cg.tests_run += 1
+                        cg.tests_needed += 1
+                        independent = cg.ci_decision(x, y, S, alpha) if decision_only else cg.ci_test(x, y, S) > alpha
+                        if independent:  # Unstable: Remove x---y right away
+                            cg.removeAdj(x, y)
+                            cg.sepset.add(x, y, S)
+                            break
 
         for (x, y) in list(set(edge_removal)):
-            cg.adjmat[x, y] = -1
+            if x < y:  # edge_removal holds both (x, y) and (y, x)
+                cg.removeAdj(x, y)
+        cg.skeleton_tests.append(cg.tests_run - tests_before)
+        cg.skeleton_tests_needed.append(cg.tests_needed - needed_before)
 
+    cg.detachCore()
+    if cg.ci_log is not None:
+        cg.ci_log.close()  # the orientation rules only read the tests of skeleton discovery
     return cg
+
+#######################################################################################################################
+
+
+def skeletonFromLog(cg, alpha):
+    """Derive the skeleton at alpha (not greater than the significance level of cg) from the tests logged by skeleton
+    discovery on cg (run with log_tests = True): x---y is removed if some logged test of x and y has p > alpha, with
+    the conditioning set of the first such test as its separating set. The larger skeleton of cg tests conditioning
+    sets that a run at alpha may not reach, so the result may lack a few edges that a run at alpha keeps, but it has
+    none that such a run removes
+    :param cg: a CausalGraph object returned by skeletonDiscovery with log_tests = True
+    :param alpha: desired significance level in (0, 1) (float)
+    :return:
+    cg_alpha: a copy of cg with the edges and sepsets found at alpha (sharing the data and test results of cg)
+    """
+    assert cg.ci_log is not None
+    no_of_var = cg.adjmat.shape[0]
+    log = cg.ci_log.columns()
+    rows = np.where(log["p_value"] > alpha)[0]  # the logged tests in the order they were run
+    X, Y = log["x"][rows], log["y"][rows]
+    pair_codes = np.minimum(X, Y).astype(np.int64) * no_of_var + np.maximum(X, Y)
+    _, first = np.unique(pair_codes, return_index=True)  # the first test with p > alpha of each pair
+
+    cg_alpha = cg.copy()
+    cg_alpha.adjmat = np.zeros((no_of_var, no_of_var))
+    np.fill_diagonal(cg_alpha.adjmat, None)
+    cg_alpha.sepset = SepsetStore(no_of_var)
+    for k in rows[first].tolist():
+        x, y = int(log["x"][k]), int(log["y"][k])
+        start = int(log["set_offset"][k])
+        cg_alpha.adjmat[x, y] = cg_alpha.adjmat[y, x] = -1
+        cg_alpha.sepset.add(x, y, log["set_members"][start:start + int(log["set_size"][k])].tolist())
+    return cg_alpha
+
+#######################################################################################################################
+
+
+def searchSepsets(cg, pairs, depth, alpha, batch_size=10000, decision_only=False, orders=None):
+    """Find the first separating set of size depth for each pair in pairs without changing adjmat
+    :param cg: a CausalGraph object
+    :param pairs: list of ordered pairs (x, y); S is drawn from the neighbors of x (excluding y) in adjmat
+    :param depth: size of the conditioning sets
+    :param alpha: desired significance level in (0, 1) (float)
+    :param batch_size: maximum number of tests evaluated in one batch (default = 10000)
+    :param decision_only: use cg.ci_decision_batch instead of computing p-values if True (default = False)
+    :param orders: a SetOrders object giving the order of the neighbors of x from which the sets are drawn
+           (default = None: ascending order)
+    :return:
+    list of (x, y, S) in the order of pairs, where S (sorted) is the first set in combinations order with p > alpha
+    (the tests run are added to cg.tests_run and the tests up to the first separating set of each pair, or all of
+    its sets if it has none, to cg.tests_needed)
+    """
+    candidates = {}  # map each adjacent pair to the iterator over its remaining conditioning sets
+    neighbors = {}  # adjmat does not change here, so the neighbors of each node are found once
+    for (x, y) in pairs:
+        if x not in neighbors:
+            neighbors[x] = cg.neighbors(x)
+        Neigh_x = neighbors[x]
+        if y not in Neigh_x:
+            continue
+        Neigh_x = np.delete(Neigh_x, np.where(Neigh_x == y))
+        if len(Neigh_x) >= depth:
+            candidates[(x, y)] = combinations(Neigh_x if orders is None else orders.neighbors(x, y, Neigh_x), depth)
+
+    sepsets = {}
+    tried = {}  # map each pair to the number of its sets taken so far
+    needed = {}  # map each separated pair to the number of its sets up to its first separating set
+    chunk_size = 1  # Sets taken per pair in each round; doubling it bounds the wasted tests by the number of needed ones
+    growth = 2 if cg.test == "Fisher_Z" else 1  # Other tests are not vectorized, so nothing is gained by wasting tests
+    while len(candidates) > 0:
+        sets_per_pair = min(chunk_size, max(1, batch_size // len(candidates)))
+        batch = []
+        ranks = []  # the position of each set of the batch in the order of the sets of its pair
+        for (x, y) in list(candidates.keys()):
+            chunk = list(islice(candidates[(x, y)], sets_per_pair))
+            if len(chunk) < sets_per_pair:
+                del candidates[(x, y)]  # all the conditioning sets of x---y are in this batch
+            batch.extend([(x, y, S) for S in chunk])
+            ranks.extend(range(tried.get((x, y), 0), tried.get((x, y), 0) + len(chunk)))
+            tried[(x, y)] = tried.get((x, y), 0) + len(chunk)
+        if len(batch) == 0:
+            break
+
+        cg.tests_run += len(batch)
+        X, Y, condition_sets = zip(*batch)
+        if decision_only:
+            independent = cg.ci_decision_batch(X, Y, condition_sets, alpha)
+        else:
+            independent = cg.ci_test_batch(X, Y, condition_sets) > alpha
+        for k in np.where(independent)[0]:
+            (x, y, S) = batch[k]
+            if (x, y) not in sepsets:  # The first independence of x and y in the batch
+                sepsets[(x, y)] = tuple(sorted(S))
+                needed[(x, y)] = ranks[k] + 1
+                candidates.pop((x, y), None)
+        chunk_size *= growth
+
+    cg.tests_needed += sum(needed.get(pair, count) for (pair, count) in tried.items())
+    return [(x, y, sepsets[(x, y)]) for (x, y) in pairs if (x, y) in sepsets]
+
+#######################################################################################################################
+
+
+def closedFormSepsets(cg, depth, alpha, decision_only=False, orders=None):
+    """Find the first separating set of size depth (0 or 1) for every ordered adjacent pair (x, y) in adjmat with
+    Fisher-Z's test, computing all the partial correlations from corr_mat with array operations
+    :param cg: a CausalGraph object (with test "Fisher_Z")
+    :param depth: size of the conditioning sets (0 or 1)
+    :param alpha: desired significance level in (0, 1) (float)
+    :param decision_only: compare |Z| with its critical value instead of computing p-values if True (default = False);
+           otherwise the p-values are stored in cg.ci_cache, as ci_test does, for the later phases
+    :param orders: a SetOrders object giving the order in which the neighbors z of x are tried as the separating set
+           of x---y (default = None: ascending order); every z is tested, but the first separating z in this order
+           is kept and the tests up to it are added to cg.tests_needed
+    :return:
+    list of (x, y, S) in the order of permutations, as returned by searchSepsets
+    """
+    assert cg.test == "Fisher_Z" and depth in [0, 1]
+    no_of_var = cg.adjmat.shape[0]
+    sample_size = cg.sampleSize()
+    std = np.sqrt(np.diag(cg.corr_mat))
+    corr = cg.corr_mat / np.outer(std, std)  # partial correlations are computed as if by inverting the submatrices
+    adjacent = (cg.adjmat == 0) | (cg.adjmat == 1)
+    ci_cache = cg.ciCache()
+
+    def runTests(r):  # return |Z|, the p-values (None if decision_only) and the decisions
+        with np.errstate(divide='ignore', invalid='ignore'):
+            Z = np.abs(0.5 * np.log((1 + r) / (1 - r)))
+        if decision_only:
+            return Z, None, Z < cg.criticalValues(alpha).fisherZ(sample_size, depth)
+        p = fisherZPValue(Z, sample_size, depth)
+        return Z, p, p > alpha
+
+    if depth == 0:
+        Z, p, independent = runTests(corr)
+        tested = np.triu(adjacent, 1)  # every unordered adjacent pair is tested once
+        cg.tests_run += int(tested.sum())
+        cg.tests_needed += int(tested.sum())
+        if cg.ci_log is not None and tested.any():
+            X, Y = np.where(tested)
+            cg.ci_log.extend(X, Y, np.zeros((len(X), 0)), Z[tested], None if p is None else p[tested])
+        if p is not None:
+            for (x, y) in zip(*np.where(tested)):
+                ci_cache.put(x, y, (), p[x, y])
+        independent = independent & adjacent
+        return [(x, y, ()) for (x, y) in zip(*np.where(independent))]
+
+    sepsets = []
+    logged = []  # the tests of x and y given z as (x, y, z, |Z|, p-value) arrays
+    for x in range(no_of_var):
+        Neigh_x = np.where(adjacent[x])[0]
+        if len(Neigh_x) < 2:
+            continue
+        r_xy = corr[x, Neigh_x][:, None]  # rows: y, columns: z (both drawn from the neighbors of x)
+        r_xz = corr[x, Neigh_x][None, :]
+        r_yz = corr[np.ix_(Neigh_x, Neigh_x)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = (r_xy - r_xz * r_yz) / np.sqrt((1 - r_xz ** 2) * (1 - r_yz ** 2))
+        Z, p, independent = runTests(r)
+        np.fill_diagonal(independent, False)  # z = y is not a conditioning set of x---y
+        cg.tests_run += len(Neigh_x) * (len(Neigh_x) - 1)
+        tested = ~np.eye(len(Neigh_x), dtype=bool)
+        rows, columns = np.where(tested)
+        if p is not None:
+            for (y, z, p_yz) in zip(Neigh_x[rows], Neigh_x[columns], p[tested]):
+                ci_cache.put(x, y, (z,), p_yz)
+        if cg.ci_log is not None:
+            logged.append((np.full(len(rows), x), Neigh_x[rows], Neigh_x[columns], Z[tested],
+                           None if p is None else p[tested]))
+        if orders is None or orders.scores is None:
+            first_z = np.argmax(independent, axis=1)  # the first separating z in combinations order
+            separated = independent.any(axis=1)
+            rank = first_z - (first_z > np.arange(len(Neigh_x)))  # z = y is skipped
+            cg.tests_needed += int(np.where(separated, rank + 1, len(Neigh_x) - 1).sum())
+            for k in np.where(separated)[0]:
+                sepsets.append((x, Neigh_x[k], (Neigh_x[first_z[k]],)))
+        else:
+            for k in range(len(Neigh_x)):
+                ordered = orders.neighbors(x, Neigh_x[k], np.delete(Neigh_x, k))
+                hits = independent[k, np.searchsorted(Neigh_x, ordered)]
+                if hits.any():
+                    rank = int(np.argmax(hits))  # the first separating z in the order of orders
+                    cg.tests_needed += rank + 1
+                    sepsets.append((x, Neigh_x[k], (ordered[rank],)))
+                else:
+                    cg.tests_needed += len(ordered)
+    if len(logged) > 0:
+        X, Y, S, Z, p = [np.concatenate(column) if column[0] is not None else None for column in zip(*logged)]
+        cg.ci_log.extend(X, Y, S[:, None], Z, p)
+    return sepsets
+
+#######################################################################################################################
+
+
+class SetOrders:
+    """Order of the neighbors of x from which the conditioning sets of each pair (x, y) are drawn at a depth of
+    skeleton discovery (combinations of the ordered neighbors try the sets of the first neighbors first). The scores
+    of the neighbors are set by update at the start of each depth, from the statistics and sepsets of cg"""
+
+    def __init__(self, cg, set_order="index", scores=None):
+        """
+        :param cg: a CausalGraph object
+        :param set_order: "index", "association" or "sepset" (see skeletonDiscovery)
+        :param scores: the scores of an earlier update (used by the worker processes of parallelSkeleton)
+        """
+        assert set_order in SET_ORDERS
+        self.cg = cg
+        self.set_order = set_order
+        self.association = None  # store the strength of the unconditional association of each pair in [0, 1]
+        self.scores = scores  # store the score of each node z as a member of the sets of the pairs of each node
+
+    ####################################################################################################################
+
+    def update(self):
+        """Score the nodes from the current state of skeleton discovery (before a depth greater than 0)"""
+        if self.set_order == "index":
+            return
+        if self.association is None:
+            self.association = associationMatrix(self.cg)
+        if self.set_order == "association":
+            self.scores = self.association
+        else:
+            self.scores = sepsetCounts(self.cg) + self.association / 2  # associations in [0, 1] only break ties
+
+    ####################################################################################################################
+
+    def neighbors(self, x, y, Neigh_x):
+        """Return Neigh_x (np.ndarray of the neighbors of x other than y) in the order in which they are tried"""
+        if self.scores is None:
+            return Neigh_x
+        if self.set_order == "association":  # z is a likely separator if it is associated with both x and y
+            key = np.minimum(self.scores[x, Neigh_x], self.scores[y, Neigh_x])
+        else:
+            key = self.scores[x, Neigh_x] + self.scores[y, Neigh_x]
+        return Neigh_x[np.argsort(-key, kind='stable')]
+
+    ####################################################################################################################
+
+    def workerState(self):
+        """Return what a worker process needs to rebuild the order (set_order and scores)"""
+        return self.set_order, self.scores
+
+#######################################################################################################################
+
+
+def associationMatrix(cg):
+    """Return the strength of the unconditional association of each pair of variables in [0, 1]: |correlation| for
+    Fisher-Z's test, and 1 - p-value of the unconditional test otherwise (read from ci_cache after depth 0, and run
+    again if it is not there, e.g., if decision_only = True or n_jobs > 1)"""
+    no_of_var = cg.adjmat.shape[0]
+    if cg.test == "Fisher_Z":
+        std = np.sqrt(np.diag(cg.corr_mat))
+        association = np.abs(cg.corr_mat / np.outer(std, std))
+    else:
+        association = np.zeros((no_of_var, no_of_var))
+        for (a, b) in combinations(range(no_of_var), 2):
+            association[a, b] = association[b, a] = 1 - cg.ci_test(a, b, ())
+    np.fill_diagonal(association, 0)
+    return association
+
+#######################################################################################################################
+
+
+def sepsetCounts(cg):
+    """Return the matrix whose entry (v, z) is the number of sepsets in cg.sepset of the pairs of v that contain z"""
+    no_of_var = cg.adjmat.shape[0]
+    counts = np.zeros((no_of_var, no_of_var))
+    for (a, b, masks) in cg.sepset.items():
+        for mask in masks:
+            S = list(maskMembers(mask))
+            counts[a, S] += 1
+            counts[b, S] += 1
+    return counts
+
+#######################################################################################################################
+
+
+def compareSetOrders(data, alpha, test_name, set_orders=SET_ORDERS, stable=True, batch_size=10000):
+    """Run skeleton discovery once with each order of the conditioning sets and report the tests saved by each.
+    The tests needed by a pair are those up to its first separating set (all of its sets if it has none): they depend
+    only on the order, while the tests run also include those run after the first separating set by the batches of
+    stabilized skeleton discovery
+    :param data, alpha, test_name, stable, batch_size: see skeletonDiscovery
+    :param set_orders: list of the orders compared (see SET_ORDERS; "index" is always run as the reference)
+    :return:
+    report: dict mapping each order to a dict with
+        "tests": number of tests run
+        "tests_per_depth": list of the numbers of tests run at each depth
+        "tests_needed": number of tests needed
+        "tests_needed_per_depth": list of the numbers of tests needed at each depth
+        "saved": number of tests needed with "index" minus number of tests needed with this order
+        "same_skeleton": True if the skeleton is the same as with "index"
+    """
+    skeletons = {}
+    for set_order in ["index"] + [order for order in set_orders if order != "index"]:
+        skeletons[set_order] = skeletonDiscovery(data, alpha, test_name, stable, batch_size, set_order=set_order)
+    reference = skeletons["index"]
+    report = {}
+    for set_order, cg in skeletons.items():
+        report[set_order] = {"tests": cg.tests_run,
+                             "tests_per_depth": list(cg.skeleton_tests),
+                             "tests_needed": cg.tests_needed,
+                             "tests_needed_per_depth": list(cg.skeleton_tests_needed),
+                             "saved": reference.tests_needed - cg.tests_needed,
+                             "same_skeleton": bool(np.array_equal(cg.adjmat != -1, reference.adjmat != -1))}
+    return report
+
+#######################################################################################################################
+
+
+def parallelSkeleton(cg, pair_of_variables, alpha, batch_size, n_jobs, decision_only=False, set_order="index"):
+    """Run stabilized skeleton discovery on cg with the pairs of each depth split among n_jobs worker processes.
+    The statistics (corr_mat or data) and adjmat are placed in shared memory, which the workers only read, and
+    the results are merged in the order of pair_of_variables so that they are identical to a serial run. The p-values
+    computed by the workers are stored in cg.ci_cache, in the order of the chunks, for the orientation rules."""
+    stats = cg.corr_mat if cg.test == "Fisher_Z" else cg.data
+    stats = np.ascontiguousarray(stats, dtype=float)
+    stats_shm = SharedMemory(create=True, size=max(stats.nbytes, 1))
+    adjmat_shm = SharedMemory(create=True, size=cg.adjmat.nbytes)
+    try:
+        np.ndarray(stats.shape, dtype=float, buffer=stats_shm.buf)[:] = stats
+        adjmat = cg.adjmat
+        cg.adjmat = np.ndarray(adjmat.shape, dtype=float, buffer=adjmat_shm.buf)
+        cg.adjmat[:] = adjmat  # the workers see every removal made here at the end of a depth
+
+        init_args = (stats_shm.name, stats.shape, adjmat_shm.name, adjmat.shape, cg.test, cg.sampleSize(),
+                     cg.data_weights, cg.ci_log is not None, cg.ci_cache.max_size)
+        with Pool(n_jobs, initializer=initSkeletonWorker, initargs=init_args) as pool:
+            orders = SetOrders(cg, set_order)
+            depth = -1
+            while cg.maxDegree() - 1 > depth:
+                depth += 1
+                tests_before = cg.tests_run
+                needed_before = cg.tests_needed
+                if depth > 0:
+                    orders.update()
+                adj_pairs = [(x, y) for (x, y) in pair_of_variables if cg.adjmat[x, y] != -1]
+                chunks = [adj_pairs[k::n_jobs] for k in range(n_jobs)]
+                tasks = [(chunk, depth, alpha, batch_size, decision_only, orders.workerState())
+                         for chunk in chunks if len(chunk) > 0]
+                if cg.test == "Fisher_Z" and depth <= 1:  # Closed forms are cheaper than dispatching to workers
+                    results = [(closedFormSepsets(cg, depth, alpha, decision_only, orders), None, 0, 0, [])]
+                else:
+                    results = pool.map(searchSepsetsWorker, tasks)
+                found = {}
+                ci_cache = cg.ciCache()
+                for (result, log, tests_run, tests_needed, cached) in results:
+                    cg.tests_run += tests_run
+                    cg.tests_needed += tests_needed
+                    for (i, j, S, p) in cached:  # the p-values computed by the workers, in the order of the chunks
+                        ci_cache.put(i, j, S, p)
+                    if log is not None:
+                        cg.ci_log.extendLog(log)  # the tests logged by the workers, in the order of the chunks
+                    for (x, y, S) in result:
+                        found[(x, y)] = S
+
+                edge_removal = []
+                for (x, y) in adj_pairs:  # Merge in the order of pair_of_variables
+                    if (x, y) in found:
+                        S = found[(x, y)]
+                        edge_removal.append((x, y))
+                        edge_removal.append((y, x))
+                        cg.sepset.add(x, y, S)
+                for (x, y) in list(set(edge_removal)):
+                    if x < y:  # edge_removal holds both (x, y) and (y, x)
+                        cg.removeAdj(x, y)
+                cg.skeleton_tests.append(cg.tests_run - tests_before)
+                cg.skeleton_tests_needed.append(cg.tests_needed - needed_before)
+    finally:
+        cg.adjmat = np.array(cg.adjmat)  # detach adjmat from the shared memory before releasing it
+        stats_shm.close()
+        stats_shm.unlink()
+        adjmat_shm.close()
+        adjmat_shm.unlink()
+
+#######################################################################################################################
+
+worker_cg = None  # the CausalGraph object of a worker process of parallelSkeleton
+worker_shm = []  # the shared memory blocks attached by a worker process of parallelSkeleton
+worker_cache_size = 0  # the maximum number of p-values a worker process of parallelSkeleton sends back per task
+
+
+def initSkeletonWorker(stats_name, stats_shape, adjmat_name, adjmat_shape, test_name, sample_size, data_weights,
+                       log_tests, cache_size):
+    """Attach a worker process of parallelSkeleton to the shared statistics and adjmat"""
+    global worker_cg, worker_shm, worker_cache_size
+    stats_shm = SharedMemory(name=stats_name)
+    adjmat_shm = SharedMemory(name=adjmat_name)
+    worker_shm = [stats_shm, adjmat_shm]  # keep the blocks referenced while the views are in use
+    stats = np.ndarray(stats_shape, dtype=float, buffer=stats_shm.buf)
+
+    worker_cg = CausalGraph(adjmat_shape[0])
+    worker_cg.adjmat = np.ndarray(adjmat_shape, dtype=float, buffer=adjmat_shm.buf)
+    worker_cg.setTestName(test_name)
+    worker_cg.sample_size = sample_size
+    worker_cg.ci_log = CITestLog() if log_tests else None
+    worker_cache_size = cache_size
+    if test_name == "Fisher_Z":
+        worker_cg.corr_mat = stats
+    else:
+        worker_cg.data = stats
+        worker_cg.data_weights = data_weights
+
+#######################################################################################################################
+
+
+def searchSepsetsWorker(task):
+    """Run searchSepsets on the graph of a worker process of parallelSkeleton and return its result with the tests
+    logged while running it (None if the tests are not logged), the numbers of tests run and needed (see
+    searchSepsets) and the p-values computed (list of (i, j, S, p-value) in the order of the tests)"""
+    pairs, depth, alpha, batch_size, decision_only, (set_order, scores) = task
+    if worker_cg.ci_log is not None:
+        worker_cg.ci_log = CITestLog()  # only the tests of this task are sent back
+    worker_cg.ci_cache = CITestCache(worker_cache_size)  # only the p-values of this task are sent back
+    worker_cg.tests_run = 0
+    worker_cg.tests_needed = 0
+    orders = SetOrders(worker_cg, set_order, scores)
+    result = searchSepsets(worker_cg, pairs, depth, alpha, batch_size, decision_only, orders)
+    cached = [(i, j, S, p) for ((i, j, S), p) in worker_cg.ci_cache.results.items()]
+    return result, worker_cg.ci_log, worker_cg.tests_run, worker_cg.tests_needed, cached
+
 #######################################################################################################################
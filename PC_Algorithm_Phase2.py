@@ -1,10 +1,11 @@
 #######################################################################################################################
-from copy import deepcopy
+import numpy as np
 from Helper import sortDictAscending
+from itertools import islice
 #######################################################################################################################
 
 
-def uc_sepset(cg, priority=3):
+def uc_sepset(cg, priority=3, max_cond_size=None):
     """
     Run (UC_sepset) to orient unshielded colliders
     :param cg: a CausalGraph object
@@ -14,19 +15,21 @@ def uc_sepset(cg, priority=3):
            2. prioritize existing colliders
            3. prioritize stronger colliders
            4. prioritize stronger* colliers
+    :param max_cond_size: largest conditioning set used to rank the colliders by priorities 3 and 4
+           (default = None: no limit)
     :return:
     cg_new: a CausalGraph object
     """
     assert priority in [0, 1, 2, 3, 4]
 
-    cg_new = deepcopy(cg)
+    cg_new = cg.copy()
 
     R0 = []     # Records of possible orientations
     UC_dict = {}
     UT = [(i, j, k) for (i, j, k) in cg_new.findUnshieldedTriples() if i < k]  # Not considering symmetric triples
 
     for (x, y, z) in UT:
-        if all(y not in S for S in cg.sepset[x, z]):
+        if not cg.sepset.contains(x, z, y):  # y is in none of the sepsets of x and z
             if priority == 0:       # 0: overwrite
                 cg_new.adjmat[y, x] = 0     # Fully orient the edge irrespective of what have been oriented
                 cg_new.adjmat[x, y] = 1
@@ -50,14 +53,12 @@ def uc_sepset(cg, priority=3):
     else:
         if priority == 3:           # 3. Order colliders by p_{xz|y} in ascending order
             for (x, y, z) in R0:
-                cond = cg_new.findCondSetsWithMid(x, z, y)
-                UC_dict[(x, y, z)] = max([cg_new.ci_test(x, z, S) for S in cond])
+                UC_dict[(x, y, z)] = maxPValues(cg_new, x, z, y, without_y=False, max_cond_size=max_cond_size)[0]
             UC_dict = sortDictAscending(UC_dict)
 
         else:                       # 4. Order colliders by p_{xy|not y} in descending order
             for (x, y, z) in R0:
-                cond = cg_new.findCondSetsWithoutMid(x, z, y)
-                UC_dict[(x, y, z)] = max([cg_new.ci_test(x, z, S) for S in cond])
+                UC_dict[(x, y, z)] = maxPValues(cg_new, x, z, y, with_y=False, max_cond_size=max_cond_size)[1]
             UC_dict = sortDictAscending(UC_dict, descending=True)
 
         for (x, y, z) in UC_dict.keys():
@@ -70,7 +71,7 @@ def uc_sepset(cg, priority=3):
 #######################################################################################################################
 
 
-def maxP(cg, priority=3):
+def maxP(cg, priority=3, max_cond_size=None):
     """
     Run (MaxP) to orient unshielded colliders
     :param cg: a CausalGraph object
@@ -80,21 +81,18 @@ def maxP(cg, priority=3):
            2. prioritize existing colliders
            3. prioritize stronger colliders
            4. prioritize stronger* colliers
+    :param max_cond_size: largest conditioning set compared (default = None: no limit)
     :return:
     cg_new: a CausalGraph object
     """
     assert priority in [0, 1, 2, 3, 4]
 
-    cg_new = deepcopy(cg)
+    cg_new = cg.copy()
     UC_dict = {}
     UT = [(i, j, k) for (i, j, k) in cg_new.findUnshieldedTriples() if i < k]  # Not considering symmetric triples
 
     for (x, y, z) in UT:
-        cond_with_y = cg_new.findCondSetsWithMid(x, z, y)
-        cond_without_y = cg_new.findCondSetsWithoutMid(x, z, y)
-
-        max_p_contain_y = max([cg_new.ci_test(x, z, S) for S in cond_with_y])
-        max_p_not_contain_y = max([cg_new.ci_test(x, z, S) for S in cond_without_y])
+        max_p_contain_y, max_p_not_contain_y = maxPValues(cg_new, x, z, y, max_cond_size=max_cond_size)
 
         if max_p_not_contain_y > max_p_contain_y:
             if priority == 0:    # 0: overwrite
@@ -137,7 +135,7 @@ def maxP(cg, priority=3):
 #######################################################################################################################
 
 
-def definiteMaxP(cg, alpha, priority=4):
+def definiteMaxP(cg, alpha, priority=4, max_cond_size=None):
     """
     Run (Definite_MaxP) to orient unshielded colliders
     :param cg: a CausalGraph object
@@ -146,40 +144,22 @@ def definiteMaxP(cg, alpha, priority=4):
            2. prioritize existing colliders
            3. prioritize stronger colliders
            4. prioritize stronger* colliers
+    :param max_cond_size: largest conditioning set compared (default = None: no limit)
     :return:
     cg_new: a CausalGraph object
     """
     assert 1 > alpha >= 0
     assert priority in [2, 3, 4]
 
-    cg_new = deepcopy(cg)
+    cg_new = cg.copy()
     UC_dict = {}
     UT = [(i, j, k) for (i, j, k) in cg_new.findUnshieldedTriples() if i < k]  # Not considering symmetric triples
 
     for (x, y, z) in UT:
-        cond_with_y = cg_new.findCondSetsWithMid(x, z, y)
-        cond_without_y = cg_new.findCondSetsWithoutMid(x, z, y)
-        max_p_contain_y = 0
-        max_p_not_contain_y = 0
-        uc_bool = True
-        nuc_bool = True
-
-        for S in cond_with_y:
-            p = cg_new.ci_test(x, z, S)
-            if p > alpha:
-                uc_bool = False
-                break
-            elif p > max_p_contain_y:
-                max_p_contain_y = p
-
-        for S in cond_without_y:
-            p = cg_new.ci_test(x, z, S)
-            if p > alpha:
-                nuc_bool = False
-                if not uc_bool:
-                    break       # ambiguous triple
-            if p > max_p_not_contain_y:
-                max_p_not_contain_y = p
+        # The search stops once both maxima exceed alpha (ambiguous triple), when neither of them is used
+        max_p_contain_y, max_p_not_contain_y = maxPValues(cg_new, x, z, y, alpha=alpha, max_cond_size=max_cond_size)
+        uc_bool = max_p_contain_y <= alpha  # no set containing y separates x and z
+        nuc_bool = max_p_not_contain_y <= alpha  # no set without y separates x and z
 
         if uc_bool:
             if nuc_bool:
@@ -213,3 +193,65 @@ def definiteMaxP(cg, alpha, priority=4):
     return cg_new
 
 #######################################################################################################################
+
+
+def pValues(cg, x, z, condition_sets):
+    """Return the p-values of the tests of x and z given each set in condition_sets (in the same order): the tests
+    logged by skeleton discovery (cg.ci_log) or cached are read first, and the others are run in batches of sets of
+    equal size
+    :param cg: a CausalGraph object
+    :param x: a node
+    :param z: a node
+    :param condition_sets: list of conditioning sets
+    :return:
+    p: np.ndarray of p-values
+    """
+    p = np.empty(len(condition_sets))
+    sizes = np.array([len(S) for S in condition_sets], dtype=int)
+    for size in np.unique(sizes):
+        positions = np.where(sizes == size)[0]
+        condition_sets_of_size = [condition_sets[k] for k in positions]
+        p[positions] = cg.ci_test_batch([x] * len(positions), [z] * len(positions), condition_sets_of_size)
+    return p
+
+#######################################################################################################################
+
+
+def maxPValues(cg, x, z, y, with_y=True, without_y=True, alpha=None, max_cond_size=None, batch_size=10000):
+    """Return the largest p-values of the tests of x and z given the conditioning sets of the neighbors of x or z
+    (see CausalGraph.iterCondSets) which contain y and which do not contain y. The sets are generated lazily and
+    tested in batches of at most batch_size sets, so that they are never all held in memory
+    :param cg: a CausalGraph object
+    :param x: a node
+    :param z: a node
+    :param y: the middle node
+    :param with_y: test the sets which contain y if True (default = True)
+    :param without_y: test the sets which do not contain y if True (default = True)
+    :param alpha: stop as soon as both largest p-values exceed alpha if given (default = None)
+    :param max_cond_size: largest conditioning set tested (default = None: no limit)
+    :param batch_size: maximum number of sets tested in one batch (default = 10000)
+    :return:
+    max_p_contain_y: largest p-value given a set containing y (0 if none is tested)
+    max_p_not_contain_y: largest p-value given a set not containing y (0 if none is tested)
+    """
+    max_p = [0, 0]  # given the sets not containing y, and containing y
+    tested = [without_y, with_y]
+    condition_sets = cg.iterCondSetsSplit(x, z, y, max_cond_size)
+    while True:
+        chunk = list(islice(condition_sets, batch_size))
+        if len(chunk) == 0:
+            break
+        batch = [(S, has_y) for (S, has_y) in chunk if tested[has_y]]
+        if len(batch) == 0:
+            continue
+        p = pValues(cg, x, z, [S for (S, has_y) in batch])
+        has_y = np.array([has_y for (S, has_y) in batch], dtype=bool)
+        if has_y.any():
+            max_p[1] = max(max_p[1], p[has_y].max())
+        if not has_y.all():
+            max_p[0] = max(max_p[0], p[~has_y].max())
+        if alpha is not None and max_p[0] > alpha and max_p[1] > alpha:
+            break
+    return max_p[1], max_p[0]
+
+#######################################################################################################################
@@ -1,5 +1,5 @@
 #######################################################################################################################
-from copy import deepcopy
+from heapq import heappush, heappop
 #######################################################################################################################
 
 
@@ -9,31 +9,31 @@ def Meek(cg):
     :return:
     cg_new: a CausalGraph object
     """
-    cg_new = deepcopy(cg)
+    cg_new = cg.copy()
 
     UT = cg_new.findUnshieldedTriples()
     Tri = cg_new.findTriangles()
     Kite = cg_new.findKites()
 
-    Loop = True
+    def rule1(i, j, k):
+        if cg_new.isFullyDirected(i, j) and cg_new.isUndirected(j, k):
+            cg_new.adjmat[j, k] = 1
+            return j, k
 
-    while Loop:
-        Loop = False
-        for (i, j, k) in UT:
-            if cg_new.isFullyDirected(i, j) and cg_new.isUndirected(j, k):
-                cg_new.adjmat[j, k] = 1
-                Loop = True
+    def rule2(i, j, k):
+        if cg_new.isFullyDirected(i, j) and cg_new.isFullyDirected(j, k) and cg_new.isUndirected(i, k):
+            cg_new.adjmat[i, k] = 1
+            return i, k
 
-        for (i, j, k) in Tri:
-            if cg_new.isFullyDirected(i, j) and cg_new.isFullyDirected(j, k) and cg_new.isUndirected(i, k):
-                cg_new.adjmat[i, k] = 1
-                Loop = True
+    def rule3(i, j, k, l):
+        if cg_new.isUndirected(i, j) and cg_new.isUndirected(i, k) and cg_new.isFullyDirected(j, l) \
+                and cg_new.isFullyDirected(k, l) and cg_new.isUndirected(i, l):
+            cg_new.adjmat[i, l] = 1
+            return i, l
 
-        for (i, j, k, l) in Kite:
-            if cg_new.isUndirected(i, j) and cg_new.isUndirected(i, k) and cg_new.isFullyDirected(j, l)\
-                    and cg_new.isFullyDirected(k, l) and cg_new.isUndirected(i, l):
-                cg_new.adjmat[i, l] = 1
-                Loop = True
+    propagate([(UT, lambda i, j, k: [(i, j)], rule1),
+               (Tri, lambda i, j, k: [(i, j), (j, k)], rule2),
+               (Kite, lambda i, j, k, l: [(j, l), (k, l)], rule3)])
 
     return cg_new
 
@@ -46,35 +46,85 @@ def definite_Meek(cg):
     :return:
     cg_new: a CausalGraph object
     """
-    cg_new = deepcopy(cg)
+    cg_new = cg.copy()
 
     Tri = cg_new.findTriangles()
     Kite = cg_new.findKites()
-
-    Loop = True
-
-    while Loop:
-        Loop = False
-        for (i, j, k) in cg_new.definite_non_UC:
-            if cg_new.isFullyDirected(i, j) and cg_new.isUndirected(j, k):
-                cg_new.adjmat[j, k] = 1
-                Loop = True
-            elif cg_new.isFullyDirected(k, j) and cg_new.isUndirected(j, i):
-                cg_new.adjmat[j, i] = 1
-                Loop = True
-
-        for (i, j, k) in Tri:
-            if cg_new.isFullyDirected(i, j) and cg_new.isFullyDirected(j, k) and cg_new.isUndirected(i, k):
-                cg_new.adjmat[i, k] = 1
-                Loop = True
-
-        for (i, j, k, l) in Kite:
-            if ((j, l, k) in cg_new.definite_UC or (k, l, j) in cg_new.definite_UC) \
-                    and ((j, i, k) in cg_new.definite_non_UC or (k, i, j) in cg_new.definite_non_UC) \
-                    and cg_new.isUndirected(i, l):
-                cg_new.adjmat[i, l] = 1
-                Loop = True
+    definite_UC = set(cg_new.definite_UC)  # hashed for O(1) membership checks
+    definite_non_UC = set(cg_new.definite_non_UC)
+
+    def rule1(i, j, k):
+        if cg_new.isFullyDirected(i, j) and cg_new.isUndirected(j, k):
+            cg_new.adjmat[j, k] = 1
+            return j, k
+        elif cg_new.isFullyDirected(k, j) and cg_new.isUndirected(j, i):
+            cg_new.adjmat[j, i] = 1
+            return j, i
+
+    def rule2(i, j, k):
+        if cg_new.isFullyDirected(i, j) and cg_new.isFullyDirected(j, k) and cg_new.isUndirected(i, k):
+            cg_new.adjmat[i, k] = 1
+            return i, k
+
+    def rule3(i, j, k, l):
+        if ((j, l, k) in definite_UC or (k, l, j) in definite_UC) \
+                and ((j, i, k) in definite_non_UC or (k, i, j) in definite_non_UC) \
+                and cg_new.isUndirected(i, l):
+            cg_new.adjmat[i, l] = 1
+            return i, l
+
+    propagate([(cg_new.definite_non_UC, lambda i, j, k: [(i, j), (k, j)], rule1),
+               (Tri, lambda i, j, k: [(i, j), (j, k)], rule2),
+               (Kite, lambda i, j, k, l: [], rule3)])  # rule3 only depends on constant lists and on i --- l
 
     return cg_new
 
 #######################################################################################################################
+
+
+def propagate(rules):
+    """Apply orientation rules until none of them applies. The result is the same as sweeping over all the
+    instances of all the rules until a sweep orients nothing, but after the first sweep only the instances that
+    a newly oriented edge can make applicable are examined again (in the order the sweeps would have reached them).
+    :param rules: list of (instances, triggers, rule), where triggers(*instance) returns the directed edges (a, b)
+           whose orientation a --> b can make the instance applicable (orientations only ever make an instance
+           inapplicable otherwise), and rule(*instance) orients an edge a --> b and returns (a, b) if it applies
+    """
+    watchers = {}  # map each directed edge (a, b) to the (rule, instance) indices it can trigger
+    for r, (instances, triggers, rule) in enumerate(rules):
+        for q, instance in enumerate(instances):
+            for edge in triggers(*instance):
+                watchers.setdefault(edge, []).append((r, q))
+
+    this_sweep = [[] for _ in rules]  # heaps of the instance indices to examine in the current sweep
+    queued = [set() for _ in rules]
+    full_sweep = True  # the first sweep examines every instance
+    while full_sweep or any(len(heap) > 0 for heap in this_sweep):
+        next_sweep = [[] for _ in rules]
+        next_queued = [set() for _ in rules]
+        for r, (instances, triggers, rule) in enumerate(rules):
+            for q in (range(len(instances)) if full_sweep else popInOrder(this_sweep[r])):
+                queued[r].discard(q)
+                oriented = rule(*instances[q])
+                if oriented is None:
+                    continue
+                for (r_w, q_w) in watchers.get(oriented, []):
+                    if r_w > r or (r_w == r and q_w > q):  # still ahead in the current sweep
+                        if not full_sweep and q_w not in queued[r_w]:
+                            heappush(this_sweep[r_w], q_w)
+                            queued[r_w].add(q_w)
+                    elif q_w not in next_queued[r_w]:
+                        heappush(next_sweep[r_w], q_w)
+                        next_queued[r_w].add(q_w)
+        this_sweep, queued = next_sweep, next_queued
+        full_sweep = False
+
+#######################################################################################################################
+
+
+def popInOrder(heap):
+    """Pop the items of heap in ascending order (including the items pushed while iterating)"""
+    while len(heap) > 0:
+        yield heappop(heap)
+
+#######################################################################################################################
@@ -1,13 +1,16 @@
 #######################################################################################################################
+from DataLoader import loadData
 from datetime import datetime
+from multiprocessing import Pool
 from os import listdir, path
 from GraphClass import tetradToCausalGraph
 from PC import pcAlgorithm
 import numpy as np
+import re
 #######################################################################################################################
 
 
-def estimateAndOutput(data_dir, output_dir, alpha, test, stable, uc_rule, uc_priority):
+def estimateAndOutput(data_dir, output_dir, alpha, test, stable, uc_rule, uc_priority, n_jobs=1):
     """ run PC algorithm over each data in data_dir and output all the estimated graphs in output_dir
     :param data_dir: name of the directory storing the datasets (string)
     :param output_dir: name of the directory returning the estimated graphs (string)
@@ -28,26 +31,23 @@ def estimateAndOutput(data_dir, output_dir, alpha, test, stable, uc_rule, uc_pri
            2. prioritize existing colliders
            3. prioritize stronger colliders
            4. prioritize stronger* colliers
+    :param n_jobs: number of worker processes running the datasets (default = 1)
+    :return:
+    failed: list of (data file name, error message) of the datasets that could not be processed
     """
     assert path.exists(data_dir)
     assert path.exists(output_dir)
 
-    data_inputs = listdir(data_dir)
-    for file in range(len(data_inputs)):
-        data_file_name = str(data_inputs[file])
-        data_path = data_dir + "/" + data_file_name
-        data = np.loadtxt(data_path, skiprows=1)
-        cg = pcAlgorithm(data, alpha, test, stable, uc_rule, uc_priority)
-        print(f"[Run {file+1}] PC Elapsed time: {round(cg.PC_elapsed,3)} seconds")
-        cg.rearrange(data_path)
-        output_path = output_dir + "/output." + data_file_name
-        cg.toTetradTxt(output_path)
+    tasks = [(data_dir + "/" + data_file_name, output_dir + "/output." + data_file_name, None,
+              alpha, test, stable, uc_rule, uc_priority, None) for data_file_name in listDataFiles(data_dir)]
+    results = runTasks(tasks, n_jobs)
+    return [(path.basename(task[0]), result) for (task, (succeeded, result)) in zip(tasks, results) if not succeeded]
 
 #######################################################################################################################
 
 
 def estimateAndCompare(data_dir, truth_dir, alpha, test, stable=True, uc_rule=0, uc_priority=-1,
-                       compare_pattern=True, adj_only=False, uc_also=True, **kwargs):
+                       compare_pattern=True, adj_only=False, uc_also=True, n_jobs=1, **kwargs):
     """ run PC algorithm over each data in data_dir, and compare each with the true graph in truth_dir
     :param data_dir: name of the directory storing the datasets (string)
     :param truth_dir: name of the directory storing the true graphs (string)
@@ -72,6 +72,7 @@ def estimateAndCompare(data_dir, truth_dir, alpha, test, stable=True, uc_rule=0,
             and compare with the true DAG otherwise (default = True)
     :param adj_only: return only adjacency-related performance statistics if True (default = False)
     :param uc_also: return unshielded colliders-related performance statistics if True (default = True)
+    :param n_jobs: number of worker processes running the datasets (default = 1)
     :param kwargs: specify the output path of the performance statistics .TXT file if "stat_path" is in kwargs
     :return:
     overall_stat: overall performance statistics (np.ndarray)
@@ -79,21 +80,13 @@ def estimateAndCompare(data_dir, truth_dir, alpha, test, stable=True, uc_rule=0,
     assert path.exists(data_dir)
     assert path.exists(truth_dir)
 
-    data_inputs = listdir(data_dir)
-    stat_overall_list = []
-    for file in range(len(data_inputs)):
-        data_file_name = str(data_inputs[file])
-        data_path = data_dir + "/" + data_file_name
-        data = np.loadtxt(data_path, skiprows=1)
-        cg = pcAlgorithm(data, alpha, test, stable, uc_rule, uc_priority)
-        print(f"[Run {file + 1}] PC elapsed time: {round(cg.PC_elapsed, 3)} seconds")
-        cg.rearrange(data_path)
-
-        truth_path = truth_dir + "/" + str(listdir(truth_dir)[file])
-        truth = tetradToCausalGraph(truth_path)
-        stat_list = cg.comparison(truth, compare_pattern, adj_only, uc_also, print_to_console=False)
-        stat_list.append(cg.PC_elapsed)
-        stat_overall_list.append(stat_list)
+    tasks = [(data_dir + "/" + data_file_name, None, truth_dir + "/" + truth_file_name,
+              alpha, test, stable, uc_rule, uc_priority, (compare_pattern, adj_only, uc_also))
+             for (data_file_name, truth_file_name) in pairFiles(data_dir, truth_dir)]
+    results = runTasks(tasks, n_jobs)
+    stat_overall_list = [result for (succeeded, result) in results if succeeded]  # in the order of the tasks
+    failed = [(path.basename(task[0]), result) for (task, (succeeded, result)) in zip(tasks, results) if not succeeded]
+    assert len(stat_overall_list) > 0, f"all the runs failed: {failed}"
 
     stat_overall_list = np.array(stat_overall_list)
     mean_stat = np.nanmean(stat_overall_list, axis=0)
@@ -109,7 +102,9 @@ def estimateAndCompare(data_dir, truth_dir, alpha, test, stable=True, uc_rule=0,
         stat_path = "results/performance_stat_" + timestamp + ".txt"
 
     file = open(str(stat_path), 'w')
-    file.write(f'Number of runs:                                    {len(data_inputs)} \n')
+    file.write(f'Number of runs:                                    {len(stat_overall_list)} \n')
+    if len(failed) > 0:
+        file.write(f'Failed runs:                                       {[name for (name, error) in failed]} \n')
     file.write(f'Significance level:                                {alpha} \n')
     file.write(f'Conditional independence test:                     {test} \n')
     file.write(f'PC stable:                                         {stable}\n')
@@ -151,6 +146,111 @@ def estimateAndCompare(data_dir, truth_dir, alpha, test, stable=True, uc_rule=0,
     return overall_stat
 
 #######################################################################################################################
+
+
+def listDataFiles(data_dir):
+    """Return the names of the files in data_dir (hidden files excluded) in natural order (e.g., data.2.txt before
+    data.10.txt)"""
+    names = [name for name in listdir(data_dir) if path.isfile(data_dir + "/" + name) and not name.startswith(".")]
+    return sorted(names, key=naturalKey)
+
+#######################################################################################################################
+
+
+def naturalKey(name):
+    """Return the key sorting name by its text and by the values of the numbers in it"""
+    return [(0, int(part), "") if part.isdigit() else (1, 0, part) for part in re.split(r"(\d+)", name)]
+
+#######################################################################################################################
+
+
+def pairFiles(data_dir, truth_dir):
+    """Pair each data file in data_dir with the true graph in truth_dir of the same name, or of the same name after
+    its first dot-separated part (e.g., data.1.txt with graph.1.txt)
+    :return:
+    list of (data file name, truth file name) in the natural order of the data files
+    """
+    truth_names = listDataFiles(truth_dir)
+    by_suffix = {}
+    for name in truth_names:
+        by_suffix.setdefault(name.split(".", 1)[-1], []).append(name)
+
+    pairs = []
+    for name in listDataFiles(data_dir):
+        if name in truth_names:
+            pairs.append((name, name))
+            continue
+        candidates = by_suffix.get(name.split(".", 1)[-1], [])
+        if len(candidates) != 1:
+            raise ValueError(f"cannot pair {name} with a unique true graph in {truth_dir} (found {candidates})")
+        pairs.append((name, candidates[0]))
+    return pairs
+
+#######################################################################################################################
+
+
+def runTasks(tasks, n_jobs=1):
+    """Run runTask on each task with n_jobs worker processes and report the progress as the tasks finish
+    :return:
+    list of the results of runTask in the order of tasks (regardless of the order in which they finish)
+    """
+    results = [None] * len(tasks)
+
+    def report(k, result):
+        results[k] = result
+        finished = sum(result is not None for result in results)
+        name = path.basename(tasks[k][0])
+        if result[0]:
+            print(f"[Run {finished}/{len(tasks)}] {name}: PC elapsed time: {round(result[2], 3)} seconds")
+        else:
+            print(f"[Run {finished}/{len(tasks)}] {name} failed: {result[1]}")
+
+    if n_jobs == 1:
+        for k in range(len(tasks)):
+            report(k, runTask(tasks[k]))
+    else:
+        with Pool(n_jobs) as pool:
+            for (k, result) in pool.imap_unordered(runIndexedTask, enumerate(tasks)):
+                report(k, result)
+    return [result[:2] for result in results]
+
+#######################################################################################################################
+
+
+def runIndexedTask(indexed_task):
+    """Run runTask on (k, task) in a worker process of runTasks and return (k, result)"""
+    k, task = indexed_task
+    return k, runTask(task)
+
+#######################################################################################################################
+
+
+def runTask(task):
+    """Run PC algorithm on one dataset, then output the estimated graph if output_path is specified and compare it
+    with the true graph at truth_path if truth_path is specified
+    :param task: (data_path, output_path, truth_path, alpha, test, stable, uc_rule, uc_priority, comparison_options)
+    :return:
+    (True, the performance statistics followed by the elapsed time, elapsed time) if it succeeds and
+    (False, the error message, None) otherwise
+    """
+    data_path, output_path, truth_path, alpha, test, stable, uc_rule, uc_priority, comparison_options = task
+    try:
+        data, column_names = loadData(data_path)  # parsed once and cached next to the file
+        cg = pcAlgorithm(data, alpha, test, stable, uc_rule, uc_priority)
+        cg.rearrange(data_path)  # the column names are read from the cache
+        stat_list = None
+        if output_path is not None:
+            cg.toTetradTxt(output_path)
+        if truth_path is not None:
+            truth = tetradToCausalGraph(truth_path)
+            compare_pattern, adj_only, uc_also = comparison_options
+            stat_list = cg.comparison(truth, compare_pattern, adj_only, uc_also, print_to_console=False)
+            stat_list.append(cg.PC_elapsed)
+        return True, stat_list, cg.PC_elapsed
+    except Exception as error:  # one failing dataset does not stop the others
+        return False, f"{type(error).__name__}: {error}", None
+
+#######################################################################################################################
 # estimateAndOutput("test/data", "test/output", 0.01, "Fisher_Z", True, 0, -1)
 # estimateAndCompare("test/data", "test/graph", 0.01, "Fisher_Z", True, 1, -1)
 #######################################################################################################################
@@ -1,14 +1,14 @@
 #######################################################################################################################
 from GraphClass import tetradToCausalGraph, subgraph
+from DataLoader import loadData
 from PC import pcAlgorithm
-import numpy as np
 #######################################################################################################################
 
 #######################################################################################################################
 ### Find the estimated graph ##########################################################################################
 #######################################################################################################################
 data_path = "test/test_data.txt"
-data = np.loadtxt(data_path, skiprows=1)                  # Import the file at data_path as data
+data, column_names = loadData(data_path)                  # Import the file at data_path as data (cached)
 cg = pcAlgorithm(data, 0.05, "Fisher_Z", True, 0, -1)     # Run PC and obtain the estimated graph (CausalGraph object)
 cg.rearrange(data_path)                                   # Rearrange the columns in accord with the order in the data
 
@@ -0,0 +1,94 @@
+#######################################################################################################################
+#######################################################################################################################
+
+
+class FactStore:
+    """Facts of conditional independence (CI) and conditional dependence (CD) decided at the significance level alpha,
+    shared by the testers of the razors (CMCTester, pMinM2FruTester, pMinimalityM1Tester and faithfulnessTester) so
+    that each test is decided once. The facts are kept in a dict keyed by the unordered pair and the sorted
+    conditioning set, so that a lookup is O(1) whatever the number of facts"""
+
+    def __init__(self, alpha):
+        """
+        :param alpha: significance level at which the facts are decided (float)
+        """
+        self.alpha = alpha
+        self.facts = {}  # map each key (i, j, S) with i < j and S sorted to True if CI and False if CD
+        self.lookups = 0  # number of lookups
+        self.reused = 0  # number of lookups answered by a stored fact
+        self.tests_run = 0  # number of tests run by test()
+
+    ####################################################################################################################
+
+    @staticmethod
+    def key(i, j, S):
+        """Return the key of the fact about i and j given S (the same for (i, j) and (j, i) and any order of S)"""
+        return (i, j, tuple(sorted(S))) if i < j else (j, i, tuple(sorted(S)))
+
+    ####################################################################################################################
+
+    def __len__(self):
+        return len(self.facts)
+
+    ####################################################################################################################
+
+    def get(self, i, j, S):
+        """Return True if i and j are known to be independent given S, False if known to be dependent, and None if the
+        fact is unknown"""
+        self.lookups += 1
+        independent = self.facts.get(self.key(i, j, S))
+        if independent is not None:
+            self.reused += 1
+        return independent
+
+    ####################################################################################################################
+
+    def add(self, i, j, S, independent):
+        """Store that i and j are independent (independent = True) or dependent (independent = False) given S"""
+        self.facts[self.key(i, j, S)] = bool(independent)
+
+    ####################################################################################################################
+
+    def addFacts(self, facts, independent):
+        """Store the facts [i, j, S] in facts (list) as CI facts (independent = True) or CD facts (independent = False)"""
+        for (i, j, S) in facts:
+            self.facts[self.key(i, j, S)] = bool(independent)
+
+    ####################################################################################################################
+
+    def test(self, cg, i, j, S):
+        """Return True if i and j are independent given S and False otherwise, from the stored fact if known and by
+        the test of cg (a CausalGraph object with its data set) otherwise"""
+        independent = self.get(i, j, S)
+        if independent is None:
+            independent = cg.ci_test(i, j, S) > self.alpha
+            self.tests_run += 1
+            self.add(i, j, S, independent)
+        return independent
+
+    ####################################################################################################################
+
+    def CIFacts(self):
+        """Return the list of CI facts [i, j, S] (with i < j)"""
+        return [[i, j, S] for ((i, j, S), independent) in self.facts.items() if independent]
+
+    ####################################################################################################################
+
+    def CDFacts(self):
+        """Return the list of CD facts [i, j, S] (with i < j)"""
+        return [[i, j, S] for ((i, j, S), independent) in self.facts.items() if not independent]
+
+#######################################################################################################################
+
+
+def factStore(alpha, I_G_star, **kwargs):
+    """Return the FactStore passed to a tester in kwargs["facts"] (a new one if absent) holding the CI facts of I_G_star
+    and of kwargs["CI_facts"] and the CD facts of kwargs["CD_facts"] (lists of [i, j, S]) if given"""
+    facts = kwargs["facts"] if kwargs.get("facts") is not None else FactStore(alpha)
+    assert facts.alpha == alpha
+    facts.addFacts(kwargs.get("CI_facts", []), True)
+    facts.addFacts(kwargs.get("CD_facts", []), False)
+    facts.addFacts(I_G_star, True)
+    return facts
+
+#######################################################################################################################
@@ -1,9 +1,8 @@
 #######################################################################################################################
-from itertools import combinations, product
-from Helper import powerset, listMinus, dag2Pattern
+from itertools import combinations
+from Helper import powerset, listMinus, maskMembers
 import networkx as nx
-from networkx import d_separated
-import numpy as np
+from DSeparation import DSeparation
 #######################################################################################################################
 
 def dSepRelations(nx_graph):
@@ -12,54 +11,159 @@ def dSepRelations(nx_graph):
     set_of_adj = set([(i, j) for (i, j) in edges if i < j] + [(j, i) for (i, j) in edges if i > j])
     possible_adj = list(combinations(nodes, 2))
     nonadj = [(i, j) for (i, j) in possible_adj if (i, j) not in set_of_adj]
+    d_sep = DSeparation.fromNxGraph(nx_graph)
     for (i, j) in nonadj:
         remaining_nodes = listMinus(nodes, [i, j])
         cond_sets = powerset(remaining_nodes)
-        for S in cond_sets:
-            if d_separated(nx_graph, {i}, {j}, S):
-                yield [i, j, S]
+        index = d_sep.index
+        separated = d_sep.isDSepBatch(index[i], index[j], [[index[k] for k in S] for S in cond_sets])
+        for S in [S for (S, is_sep) in zip(cond_sets, separated) if is_sep]:
+            yield [i, j, S]
 
 #######################################################################################################################
 
-def nxGraphToPattern(nx_graph):
-    no_of_var = len(nx_graph.nodes)
-    assert no_of_var > 0
-    adjmat = np.zeros((no_of_var, no_of_var))
-    np.fill_diagonal(adjmat, None)
-    adjmat[adjmat == 0] = -1
-    for (i, j) in nx_graph.edges:
-        adjmat[i, j] = 1
-        adjmat[j, i] = 0
-    pattern = dag2Pattern(adjmat)
-    return pattern
+def dSepRelationsBySize(nx_graph):
+    """Yield the d-separation relations [i, j, S] of nx_graph (networkx.DiGraph object) in increasing order of |S|; the
+    separators of each non-adjacent pair are enumerated by DSeparation.separators instead of testing every subset"""
+    labels = list(nx_graph.nodes)
+    nonadj = [(i, j) for (i, j) in combinations(labels, 2) if not (nx_graph.has_edge(i, j) or nx_graph.has_edge(j, i))]
+    d_sep = DSeparation.fromNxGraph(nx_graph)
+    index = d_sep.index
+    for size in range(len(labels) - 1):
+        for (i, j) in nonadj:
+            for mask in d_sep.separators(index[i], index[j], size):
+                yield [i, j, tuple(sorted(labels[k] for k in maskMembers(mask)))]
 
 #######################################################################################################################
 
-def dagsGenerator(no_of_nodes, no_of_edges):
-    """Create zero_one_lists list of DAGs (nx.DiGraph objects) with assigned number of nodes and edges"""
-    if (no_of_nodes * (no_of_nodes - 1))/2 < no_of_edges:
-        return []
-    else:
-        range_of_nodes = range(no_of_nodes)
+def patternsGenerator(no_of_nodes, skeleton, no_of_edges):
+    """Yield one DAG (nx.DiGraph object over the nodes 0, ..., no_of_nodes - 1) of each Markov equivalence class (i.e.,
+    each pattern) whose adjacencies are no_of_edges of the pairs (i, j) in skeleton (list), lazily and without keeping
+    the patterns already yielded (see skeletonPatterns)"""
+    skeleton = [(int(i), int(j)) for (i, j) in skeleton]
+    for adj_set in combinations(skeleton, no_of_edges):
+        for dag_edges in skeletonPatterns(no_of_nodes, adj_set):
+            g = nx.DiGraph()
+            g.add_nodes_from(range(no_of_nodes))
+            g.add_edges_from(dag_edges)
+            yield g
 
-        list_of_possible_adj = list(combinations(range_of_nodes, 2))
-        list_of_adj_sets = list(combinations(list_of_possible_adj, no_of_edges))
-        for adj_set in list_of_adj_sets:
-            bool_combinations = list(product([True, False], repeat=no_of_edges))
+#######################################################################################################################
+
+def skeletonPatterns(no_of_nodes, adj_set):
+    """Yield the edges of one DAG of each pattern with the adjacencies adj_set (list of pairs). A pattern is its
+    skeleton with its set of unshielded colliders, so the sets of unshielded colliders are enumerated directly: each
+    unshielded triple is decided to be a collider or not in turn, the orientations implied by the decisions are
+    propagated (a collider a --> c <-- b, a non-collider with a --> c forces c --> b, and a --> c <-- b forces the
+    collider), and the branches with an edge oriented both ways or a directed cycle are cut. A complete set of
+    decisions is a pattern iff the oriented edges can be extended to a DAG without new unshielded colliders, which
+    is decided, and the DAG built, by Dor and Tarsi's algorithm; each pattern is thus yielded once, without
+    enumerating its DAGs or keeping the patterns already yielded"""
+    adj_set = list(adj_set)
+    edge_index = {}
+    neighbors = [0] * no_of_nodes
+    for (e, (i, j)) in enumerate(adj_set):
+        edge_index[(i, j)] = edge_index[(j, i)] = e
+        neighbors[i] |= 1 << j
+        neighbors[j] |= 1 << i
+    triples = [(a, c, b, edge_index[(a, c)], edge_index[(c, b)]) for c in range(no_of_nodes)
+               for (a, b) in combinations(maskMembers(neighbors[c]), 2) if not (neighbors[a] >> b) & 1]
+    triples_of_edge = [[] for _ in adj_set]  # the triples to examine again when an edge is oriented
+    for (t, (a, c, b, e_ac, e_cb)) in enumerate(triples):
+        triples_of_edge[e_ac].append(t)
+        triples_of_edge[e_cb].append(t)
+
+    def propagate(heads, children, colliders, queue):
+        """Apply the decisions of the triples in queue and of the triples sharing an edge oriented meanwhile to heads
+        (the head of each edge, or -1), children (bitmask of each node) and colliders (True, False or None for each
+        triple); return False if an edge is oriented both ways or a directed cycle is formed"""
+
+        def orient(u, v):
+            e = edge_index[(u, v)]
+            if heads[e] == v:
+                return True
+            if heads[e] == u:
+                return False
+            reached, frontier = 1 << v, 1 << v
+            while frontier:  # u --> v closes a directed cycle iff u is a descendant of v
+                next_frontier = 0
+                for w in maskMembers(frontier):
+                    next_frontier |= children[w]
+                frontier = next_frontier & ~reached
+                reached |= frontier
+            if (reached >> u) & 1:
+                return False
+            heads[e] = v
+            children[u] |= 1 << v
+            queue.extend(triples_of_edge[e])
+            return True
 
-            for bool_comb in bool_combinations:
-                add_directed_edges = []
-                for k in range(len(bool_comb)):
-                    if bool_comb[k]:
-                        add_directed_edges.append(adj_set[k])
-                    else:
-                        add_directed_edges.append((adj_set[k][1], adj_set[k][0]))
+        while len(queue) > 0:
+            t = queue.pop()
+            a, c, b, e_ac, e_cb = triples[t]
+            if colliders[t] is None:
+                if heads[e_ac] == c and heads[e_cb] == c:
+                    colliders[t] = True
+                elif heads[e_ac] == a or heads[e_cb] == b:
+                    colliders[t] = False
+                else:
+                    continue
+            if colliders[t]:
+                if not (orient(a, c) and orient(b, c)):
+                    return False
+            elif (heads[e_ac] == c and not orient(c, b)) or (heads[e_cb] == c and not orient(c, a)):
+                return False
+        return True
+
+    def search(heads, children, colliders, queue):
+        if not propagate(heads, children, colliders, queue):
+            return
+        undecided = next((t for t in range(len(triples)) if colliders[t] is None), None)
+        if undecided is None:
+            dag_edges = consistentExtension(no_of_nodes, neighbors, adj_set, heads)
+            if dag_edges is not None:
+                yield dag_edges
+            return
+        for is_collider in [True, False]:
+            next_colliders = list(colliders)
+            next_colliders[undecided] = is_collider
+            yield from search(list(heads), list(children), next_colliders, [undecided])
+
+    yield from search([-1] * len(adj_set), [0] * no_of_nodes, [None] * len(triples), [])
+
+#######################################################################################################################
 
-                g = nx.DiGraph()
-                g.add_nodes_from(range_of_nodes)
-                for (i, j) in add_directed_edges:
-                    g.add_edge(i, j, color='b')
-                if nx.is_directed_acyclic_graph(g):
-                    yield g
+def consistentExtension(no_of_nodes, neighbors, adj_set, heads):
+    """Return the edges of a DAG with the adjacencies adj_set (list of pairs; neighbors holds the bitmask of the
+    neighbors of each node), the orientations in heads (the head of each edge of adj_set, or -1 if unoriented) and no
+    other unshielded colliders than those of the oriented edges, or None if there is none (Dor and Tarsi, 1992): a
+    node without oriented edges out of it whose unoriented neighbors are adjacent to all its other neighbors gets all
+    its unoriented edges into it and is removed, until no node is left (an extension exists) or no such node exists
+    (none exists)"""
+    children = [0] * no_of_nodes
+    unoriented = [0] * no_of_nodes
+    dag_edges = []
+    for ((i, j), head) in zip(adj_set, heads):
+        if head == -1:
+            unoriented[i] |= 1 << j
+            unoriented[j] |= 1 << i
+        else:
+            tail = i if head == j else j
+            children[tail] |= 1 << head
+            dag_edges.append((tail, head))
+    remaining = (1 << no_of_nodes) - 1
+    while remaining:
+        for x in maskMembers(remaining):
+            adjacent = neighbors[x] & remaining
+            if children[x] & remaining:
+                continue
+            undirected = maskMembers(unoriented[x] & remaining)
+            if all(adjacent & ~(1 << y) & ~neighbors[y] == 0 for y in undirected):
+                dag_edges += [(y, x) for y in undirected]
+                remaining &= ~(1 << x)
+                break
+        else:
+            return None
+    return dag_edges
 
 #######################################################################################################################
\ No newline at end of file
@@ -2,8 +2,8 @@
 from GraphClass import tetradToCausalGraph
 from itertools import combinations
 from Test_CMC import CMCTester
+from FactStore import factStore
 from Helper import powerset, listMinus
-from copy import deepcopy
 import time
 import numpy as np
 #######################################################################################################################
@@ -15,6 +15,8 @@ def faithfulnessTester(true_cg, data, test_name, alpha, **kwargs):
     :param data: data set (numpy ndarray)
     :param test_name: name of the independence test being used (string)
     :param alpha: a desired significance levels in (0, 1) (float)
+    :param kwargs: CMC_result = [CMC, I_G_star] as returned by CMCTester; facts = FactStore shared with the other
+           testers; CI_facts and CD_facts = lists of known facts [i, j, S]
     :return:
     1. CFC: True if CFC is satisfied and False otherwise
     2. adj_faithful: True if adj-faithfulness is satisfied and False otherwise
@@ -29,13 +31,12 @@ def faithfulnessTester(true_cg, data, test_name, alpha, **kwargs):
         CMC = kwargs["CMC_result"][0]
         I_G_star = kwargs["CMC_result"][1]
     else:
-        CMC, I_G_star = CMCTester(true_cg, data, test_name, alpha)
+        CMC, I_G_star = CMCTester(true_cg, data, test_name, alpha, facts=kwargs.get("facts"))
 
     if not CMC:
         return False, False, False
     else:
-        CI_facts = kwargs["CI_facts"] + I_G_star if "CI_facts" in kwargs else deepcopy(I_G_star)
-        CD_facts = kwargs["CD_facts"] if "CD_facts" in kwargs else deepcopy([])
+        facts = factStore(alpha, I_G_star, **kwargs)
 
     range_of_nodes = range(data.shape[1])
     adj = [(i, j) for (i, j) in cg.findAdj() if i < j]
@@ -50,55 +51,27 @@ def faithfulnessTester(true_cg, data, test_name, alpha, **kwargs):
         cond_sets = powerset(remaining_nodes)
         if (i, j) in adj and adj_faithful:
             for S in cond_sets:
-                if [i, j, S] in CI_facts:
+                if facts.test(cg, i, j, S):
                     adj_faithful = False
                     CFC = False
-                elif [i, j, S] in CD_facts:
-                    continue
-                else:
-                    p = cg.ci_test(i, j, S)
-                    if p > alpha:
-                        adj_faithful = False
-                        CFC = False
         else:
             UT_ij = [(x, y, z) for (x, y, z) in UT if x == i and z == j]
             if len(UT_ij) != 0 and ori_faithful:
                 for (x, y, z) in UT_ij:
                     if cg.isCollider(x, y, z):
                         for S in [S_sets for S_sets in cond_sets if y in S_sets]:
-                            if [i, j, S] in CI_facts:
+                            if facts.test(cg, i, j, S):
                                 ori_faithful = False
                                 CFC = False
-                            elif [i, j, S] in CD_facts:
-                                continue
-                            else:
-                                p = cg.ci_test(i, j, S)
-                                if p > alpha:
-                                    ori_faithful = False
-                                    CFC = False
                     else:
                         for S in [S_sets for S_sets in cond_sets if y not in S_sets]:
-                            if [i, j, S] in CI_facts:
+                            if facts.test(cg, i, j, S):
                                 ori_faithful = False
                                 CFC = False
-                            elif [i, j, S] in CD_facts:
-                                continue
-                            else:
-                                p = cg.ci_test(i, j, S)
-                                if p > alpha:
-                                    ori_faithful = False
-                                    CFC = False
             elif CFC:
-                for S in cond_sets:
-                    if not cg.isDSep(i, j, S):
-                        if [i, j, S] in CI_facts:
-                            CFC = False
-                        elif [i, j, S] in CD_facts:
-                            continue
-                        else:
-                            p = cg.ci_test(i, j, S)
-                            if p > alpha:
-                                CFC = False
+                for (S, is_sep) in zip(cond_sets, cg.isDSepBatch(i, j, cond_sets)):
+                    if not is_sep and facts.test(cg, i, j, S):
+                        CFC = False
 
     return CFC, adj_faithful, ori_faithful
 
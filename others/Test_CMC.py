@@ -1,17 +1,25 @@
 #######################################################################################################################
 from GraphClass import tetradToCausalGraph
-from GenerateDAG import dSepRelations
+from GenerateDAG import dSepRelations, dSepRelationsBySize
+from FactStore import FactStore
+from itertools import groupby, islice
 import numpy as np
 import time
 #######################################################################################################################
 
 
-def CMCTester(true_cg, data, test_name, alpha):
+def CMCTester(true_cg, data, test_name, alpha, by_size=True, batch_size=1000, facts=None):
     """Test CMC
     :param true_cg: the true CausalGraph object (use tetradToCausalGraph)
     :param data: data set (numpy ndarray)
     :param test_name: name of the independence test being used (string)
     :param alpha: a desired significance levels in (0, 1) (float)
+    :param by_size: enumerate the d-separation relations structurally in increasing order of |S| if True (see
+           GenerateDAG.dSepRelationsBySize), so that the violations by small conditioning sets are found first, and
+           test every subset of the other nodes of each pair if False (default = True)
+    :param batch_size: number of d-separation relations tested together (default = 1000)
+    :param facts: FactStore in which the decided tests are recorded and from which known facts are read (default =
+           None, i.e., a new FactStore)
     :return:
     1. True if CMC is satisfied and False otherwise
     2. I_G_star: I(G*) if CMC is true, else []
@@ -21,17 +29,33 @@ def CMCTester(true_cg, data, test_name, alpha):
     cg.setTestName(test_name)
     cg.corr_mat = np.corrcoef(data, rowvar=False) if test_name == "Fisher_Z" else []
 
+    facts = facts if facts is not None else FactStore(alpha)
+    assert facts.alpha == alpha
     CMC = True
     I_G_star = []
 
-    for (i, j, S) in dSepRelations(cg.nx_graph):
-        if not CMC:
-            break
-        I_G_star.append([i, j, S])
-        p = cg.ci_test(i, j, S)
-        if p <= alpha:
-            CMC = False
+    relations = dSepRelationsBySize(cg.nx_graph) if by_size else dSepRelations(cg.nx_graph)
+    while CMC:
+        batch = list(islice(relations, batch_size))
+        if len(batch) == 0:
             break
+        I_G_star += batch
+        for _, group in groupby(batch, key=lambda relation: len(relation[2])):  # the tests of a batch have equal |S|
+            group = list(group)
+            known = [facts.get(i, j, S) for (i, j, S) in group]
+            if False in known:
+                CMC = False
+                break
+            group = [relation for (relation, independent) in zip(group, known) if independent is None]
+            if len(group) == 0:
+                continue
+            p = cg.ci_test_batch([i for (i, _, _) in group], [j for (_, j, _) in group], [S for (_, _, S) in group])
+            facts.tests_run += len(group)
+            for ((i, j, S), p_value) in zip(group, p):
+                facts.add(i, j, S, p_value > alpha)
+            if np.any(p <= alpha):
+                CMC = False
+                break
 
     if CMC:
         return True, I_G_star
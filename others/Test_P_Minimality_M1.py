@@ -2,10 +2,11 @@
 from GraphClass import tetradToCausalGraph
 from itertools import combinations
 from Helper import powerset, listMinus
-from GenerateDAG import dagsGenerator, nxGraphToPattern
+from GenerateDAG import patternsGenerator
 from Test_CMC import CMCTester
+from DSeparation import DSeparation
+from FactStore import factStore
 import numpy as np
-import networkx as nx
 import time
 #######################################################################################################################
 
@@ -15,10 +16,12 @@ def pMinimalityM1Tester(true_cg, data, test_name, alpha, **kwargs):
     :param data: data set (numpy ndarray)
     :param test_name: name of the independence test being used (string)
     :param alpha: a desired significance levels in (0, 1) (float)
+    :param kwargs: CMC_result = [CMC, I_G_star] as returned by CMCTester; facts = FactStore shared with the other
+           testers; CI_facts and CD_facts = lists of known facts [i, j, S]
     :return:
     1. True if P-Minimality is satisfied and False otherwise (using M1)
-    2. CI_facts: a list of conditional independence relations
-    3. CD_facts: a list of conditional dependence relations
+    2. CI_facts: a list of conditional independence relations (found by this tester)
+    3. CD_facts: a list of conditional dependence relations (found by this tester)
     """
     true_cg.data = data
     true_cg.setTestName(test_name)
@@ -30,15 +33,18 @@ def pMinimalityM1Tester(true_cg, data, test_name, alpha, **kwargs):
         CMC = kwargs["CMC_result"][0]
         I_G_star = kwargs["CMC_result"][1]
     else:
-        CMC, I_G_star = CMCTester(true_cg, data, test_name, alpha)
+        CMC, I_G_star = CMCTester(true_cg, data, test_name, alpha, facts=kwargs.get("facts"))
 
     if not CMC:
         return False, [], []
     else:
         no_of_nodes = data.shape[1]
         range_of_nodes = range(no_of_nodes)
-        CI_facts = []   # Save facts of conditional independence for convenience
-        CD_facts = []   # Save facts of conditional dependence for convenience
+        facts = factStore(alpha, I_G_star, **kwargs)  # Save facts of conditional (in)dependence for convenience
+        I_G_star_keys = set(facts.key(i, j, S) for (i, j, S) in I_G_star)
+        CI_facts = []   # The facts found by this tester (returned), in the order they are first needed
+        CD_facts = []
+        recorded = set()
 
         # We try to construct a DAG G' where
         # 1. I(G*) is a proper subset of I(G')
@@ -51,77 +57,53 @@ def pMinimalityM1Tester(true_cg, data, test_name, alpha, **kwargs):
 
         while no_of_edges_prime >= 0:
 
-            patterns_list = []
-
-            for g_prime in dagsGenerator(no_of_nodes, no_of_edges_prime):
-
-                # Due to Lemma, we only search for DAGs with a subset of adjacencies
+            # Due to Lemma, we only search for DAGs with a subset of adjacencies, one DAG per pattern
+            for g_prime in patternsGenerator(no_of_nodes, sorted(set_of_true_adj), no_of_edges_prime):
                 e = g_prime.edges
                 set_of_prime_adj = set([(i, j) for (i, j) in e if i < j] + [(j, i) for (i, j) in e if i > j])
-                if not set_of_prime_adj.issubset(set_of_true_adj):
+
+                # Next, we check I(G*) is a subset of I(G')
+                # If yes, I(G') is a proper subset of I(G*) because G' has fewer edges than G*
+                # Otherwise, we move on to the next G'
+                next_prime = False
+                d_sep = DSeparation.fromNxGraph(g_prime)  # the nodes of g_prime are 0, ..., no_of_nodes - 1
+                for CI in I_G_star:
+                    if not d_sep.isDSep(CI[0], CI[1], CI[2]):
+                        next_prime = True
+                        break
+                if next_prime:
                     continue # Look for next g_prime
                 else:
-                    p = nxGraphToPattern(g_prime)
 
-                    if len(patterns_list) == 0:
-                        existing_pattern = False
-                    else:
-                        existing_pattern = False
-                        for pattern_old in patterns_list:
-                            if np.array_equal(p, pattern_old, equal_nan = True):
-                                existing_pattern = True
-                                break
+                    # Finally, we check if I(G') is a subset of I(P) (i.e., G' is Markov)
+                    possible_adj = list(combinations(range_of_nodes, 2))
+                    prime_nonadj = [(i, j) for (i, j) in possible_adj if (i, j) not in set_of_prime_adj]
+                    prime_CMC = True
 
-                    if existing_pattern:
-                        continue
-                    else:
-                        patterns_list.append(p)
-
-                    # Next, we check I(G*) is a subset of I(G')
-                    # If yes, I(G') is a proper subset of I(G*) because G' has fewer edges than G*
-                    # Otherwise, we move on to the next G'
-                    next_prime = False
-                    for CI in I_G_star:
-                        if not nx.d_separated(g_prime, {CI[0]}, {CI[1]}, CI[2]):
-                            next_prime = True
+                    for (i, j) in prime_nonadj:
+                        if not prime_CMC:
                             break
-                    if next_prime:
-                        continue # Look for next g_prime
-                    else:
-
-                        # Finally, we check if I(G') is a subset of I(P) (i.e., G' is Markov)
-                        possible_adj = list(combinations(range_of_nodes, 2))
-                        prime_nonadj = [(i, j) for (i, j) in possible_adj if (i, j) not in set_of_prime_adj]
-                        prime_CMC = True
-
-                        for (i, j) in prime_nonadj:
-                            if not prime_CMC:
+                        remaining_nodes = listMinus(range_of_nodes, [i, j])
+                        cond_sets = powerset(remaining_nodes)
+                        separated = d_sep.isDSepBatch(i, j, cond_sets)
+                        for (S, is_sep) in zip(cond_sets, separated):
+                            if not is_sep:
+                                continue
+                            key = facts.key(i, j, S)
+                            if key in I_G_star_keys:
+                                continue # Check next CI if it has been already checked in I(G*)
+                            independent = facts.test(true_cg, i, j, S)
+                            if key not in recorded:
+                                recorded.add(key)
+                                (CI_facts if independent else CD_facts).append([i, j, S])
+                            if not independent:
+                                prime_CMC = False
                                 break
-                            remaining_nodes = listMinus(range_of_nodes, [i, j])
-                            cond_sets = powerset(remaining_nodes)
-                            for S in cond_sets:
-                                if [i, j, S] in I_G_star:
-                                    continue # Check next CI if it has been already checked in I(G*)
-                                elif nx.d_separated(g_prime, {i}, {j}, S):
-                                    if [i, j, S] in CI_facts:
-                                        continue
-                                    elif [i, j, S] in CD_facts:
-                                        prime_CMC = False
-                                        break
-                                    else:
-                                        p = true_cg.ci_test(i, j, S)
-                                        if p > alpha:
-                                            CI_facts.append([i, j, S])
-                                            continue
-                                        else:
-                                            CD_facts.append([i, j, S])
-                                            prime_CMC = False
-                                            break
 
-                        if not prime_CMC:
-                            continue # if G' is not Markov, look for the next G'
-                        else:
-                            return False, CI_facts, CD_facts # G' is found and thus G* is not p-minimal
+                    if not prime_CMC:
+                        continue # if G' is not Markov, look for the next G'
+                    else:
+                        return False, CI_facts, CD_facts # G' is found and thus G* is not p-minimal
 
             no_of_edges_prime += -1
 
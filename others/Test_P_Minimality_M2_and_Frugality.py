@@ -1,21 +1,11 @@
 #######################################################################################################################
 from GraphClass import tetradToCausalGraph, toPattern, CausalGraph
-from GenerateDAG import dagsGenerator, dSepRelations, nxGraphToPattern
 from Test_CMC import CMCTester
-from itertools import permutations
+from DSeparation import DSeparation
+from FactStore import factStore
+from Helper import setMask, maskMembers
 import numpy as np
-import networkx as nx
-from itertools import combinations
 import time
-from copy import deepcopy
-#######################################################################################################################
-
-#######################################################################################################################
-
-def causal_ordering(no_of_nodes):
-    for order in permutations(range(no_of_nodes), no_of_nodes):
-        yield order
-
 #######################################################################################################################
 
 def pMinM2FruTester(true_cg, data, test_name, alpha, **kwargs):
@@ -24,12 +14,14 @@ def pMinM2FruTester(true_cg, data, test_name, alpha, **kwargs):
     :param data: data set (numpy ndarray)
     :param test_name: name of the independence test being used (string)
     :param alpha: a desired significance levels in (0, 1) (float)
+    :param kwargs: CMC_result = [CMC, I_G_star] as returned by CMCTester; facts = FactStore shared with the other
+           testers; CI_facts and CD_facts = lists of known facts [i, j, S]
     :return:
     1. P_minimal: True if P-Minimality is satisfied and False otherwise (using M2)
     2. Frugal: True if frugality is satisfied and False otherwise
     3. u_frugal: True if u-frugality is satisfied and False otherwise
-    4. CI_facts: a list of conditional independence relations
-    5. CD_facts: a list of conditional dependence relations
+    4. CI_facts: a list of conditional independence relations (the CI facts of the FactStore)
+    5. CD_facts: a list of conditional dependence relations (the CD facts of the FactStore)
     """
     true_cg.data = data
     true_cg.setTestName(test_name)
@@ -39,42 +31,64 @@ def pMinM2FruTester(true_cg, data, test_name, alpha, **kwargs):
         CMC = kwargs["CMC_result"][0]
         I_G_star = kwargs["CMC_result"][1]
     else:
-        CMC, I_G_star = CMCTester(true_cg, data, test_name, alpha)
+        CMC, I_G_star = CMCTester(true_cg, data, test_name, alpha, facts=kwargs.get("facts"))
 
     if not CMC:
         return [False, False, False, [], []]
     else:
-        CI_facts = kwargs["CI_facts"] + I_G_star if "CI_facts" in kwargs else deepcopy(I_G_star)
-        CD_facts = kwargs["CD_facts"] if "CD_facts" in kwargs else deepcopy([])
+        facts = factStore(alpha, I_G_star, **kwargs)
 
         no_of_nodes = data.shape[1]
         nodes = range(no_of_nodes)
+        full = (1 << no_of_nodes) - 1
         no_of_true_edges = len(true_cg.findFullyDirected())
-        true_adj = set([(i, j) for (i, j) in true_cg.findAdj() if i < j])
-
-        def DAG_construct(pi):
-            pi_edges = []
-            for (j, k) in combinations(nodes, 2): # j < k guaranteed
-                pi_j = pi[j]
-                pi_k = pi[k]
-                pi_cond_set = tuple(sorted(pi[0:j] + pi[j+1:k]))
-                if (pi_j, pi_k, pi_cond_set) in CI_facts:
+        true_neighbors = [setMask(true_cg.neighbors(v)) for v in nodes]  # bitmask of the adjacencies of each node
+
+        # The DAG G_pi of an ordering pi has the edge pi_j --> pi_k iff pi_j and pi_k are dependent given the other
+        # predecessors of pi_k, so the parents of a node depend only on the node and the set of its predecessors.
+        # They are memoized per (node, set of predecessors), and the orderings are searched as sequences of sets of
+        # predecessors: 2^n sets instead of n! orderings.
+        parents_memo = {}
+
+        def parents(v, P):
+            """Return the bitmask of the parents of v in G_pi if P (bitmask) is the set of the predecessors of v"""
+            if (v, P) not in parents_memo:
+                pa = 0
+                for u in maskMembers(P):
+                    if not facts.test(true_cg, u, v, maskMembers(P & ~(1 << u))):
+                        pa |= 1 << u
+                parents_memo[(v, P)] = pa
+            return parents_memo[(v, P)]
+
+        # min_edges[P]: minimal number of edges of G_pi among the nodes outside P over the orderings starting with P
+        min_edges = [0] * (full + 1)
+        for P in range(full - 1, -1, -1):
+            min_edges[P] = min(bin(parents(v, P)).count('1') + min_edges[P | (1 << v)]
+                               for v in nodes if not (P >> v) & 1)
+
+        def DAGsWithinBound(max_edges, allowed):
+            """Yield the distinct DAGs G_pi with at most max_edges edges in which the parents of each node v are in
+            allowed[v] (bitmask), as lists of edges; an ordering is cut as soon as its edges so far plus min_edges
+            of its remaining nodes exceed max_edges, and the orderings reaching the same set of predecessors with
+            the same edges are continued once"""
+            stack = [(0, (0,) * no_of_nodes, 0)]  # (set of the nodes placed, parents of each node, number of edges)
+            visited = set()
+            while len(stack) > 0:
+                P, pa_masks, no_of_edges = stack.pop()
+                if P == full:
+                    yield [(u, v) for v in nodes for u in maskMembers(pa_masks[v])]
                     continue
-                elif (pi_j, pi_k, pi_cond_set) in CD_facts:
-                    pi_edges.append((pi_j, pi_k))
-                    continue
-                else:
-                    p = true_cg.ci_test(pi_j, pi_k, pi_cond_set)
-                    if p > alpha:
-                        CI_facts.append([pi_j, pi_k, pi_cond_set])
-                        CI_facts.append([pi_k, pi_j, pi_cond_set])
+                for v in nodes:
+                    if (P >> v) & 1:
                         continue
-                    else:
-                        CD_facts.append([pi_j, pi_k, pi_cond_set])
-                        CD_facts.append([pi_k, pi_j, pi_cond_set])
-                        pi_edges.append((pi_j, pi_k))
+                    pa = parents(v, P)
+                    new_no_of_edges = no_of_edges + bin(pa).count('1')
+                    if pa & ~allowed[v] or new_no_of_edges + min_edges[P | (1 << v)] > max_edges:
                         continue
-            return pi_edges
+                    state = (P | (1 << v), pa_masks[:v] + (pa,) + pa_masks[v + 1:])
+                    if state not in visited:
+                        visited.add(state)
+                        stack.append(state + (new_no_of_edges,))
 
         def patternEdges(cg):
             pattern = toPattern(cg, checkDAG=False)
@@ -82,67 +96,29 @@ def pMinM2FruTester(true_cg, data, test_name, alpha, **kwargs):
             pattern_undirected = set([(i, j) for (i, j) in pattern.findUndirected() if i < j])
             return pattern_directed, pattern_undirected
 
-        possibly_max_frugal_DAGs = []
-
-        P_minimal = True
-        Frugal = True
-
-        for pi in causal_ordering(no_of_nodes):
-            if not P_minimal:
-                return [False, False, False, CI_facts, CD_facts]
-            pi_edges = DAG_construct(pi)
-            # We know that the set of pi_edges will constitute a SGS-minimal Markovian DAG G_pi.
-
-            # Case 1: When |E(G_pi)| > |E(G*)|, G_pi cannot prove the non-P-minimality or non-frugality of G*
-            if len(pi_edges) > no_of_true_edges:
-                continue
-
-            # Case 2: When |E(G_pi)| = |E(G*)|, G_pi is possibly a maximally frugal DAG
-            elif len(pi_edges) == no_of_true_edges:
-                if Frugal:
-                    possibly_max_frugal_DAGs.append(pi_edges)
-
-            # Case 3: When |E(G_pi) < |E(G*)|, frugality fails but we still need to know whether G* is P-minimal
-            else:
-                Frugal = False
-
-                # If I(G*) is a proper subset of I(G_pi), adj(G_pi) is a proper subset of adj(G*)
-                pi_adj = set([(i, j) for (i, j) in pi_edges if i < j] + [(j, i) for (i, j) in pi_edges if i > j])
-                if not pi_adj.issubset(true_adj): # If subset, then proper subset (because of Case 3)
-                    continue # Look for next G_pi
-                else:
-                    # Next, we check I(G*) is a subset of I(G_pi).
-                    # We construct the nx_graph object for G_pi to check d-separation.
-                    pi_nx_graph = nx.DiGraph()
-                    pi_nx_graph.add_nodes_from(nodes)
-                    pi_nx_graph.add_edges_from(pi_edges)
-                    next_pi = False
-                    for CI in I_G_star:
-                        if not nx.d_separated(pi_nx_graph, {CI[0]}, {CI[1]}, CI[2]):
-                            next_pi = True
-                            break
-                    if next_pi:
-                        continue # Look for next pi
-                    else:
-                        P_minimal = False
-
-        if not P_minimal:
-            return [False, False, False, CI_facts, CD_facts]
-        elif not Frugal:
-            return [True, False, False, CI_facts, CD_facts]
-        else:
-            true_pattern_directed, true_pattern_undirected = patternEdges(true_cg)
-            for pi_edges in possibly_max_frugal_DAGs:
-                est_cg = CausalGraph(no_of_nodes)
-                est_cg.adjmat[est_cg.adjmat == 0] = -1 # Initiate an empty graph
-                for (j, k) in pi_edges:
-                    est_cg.addDirectedEdge(j, k)
-                est_pattern_directed, est_pattern_undirected = patternEdges(est_cg)
-                if est_pattern_directed != true_pattern_directed or est_pattern_undirected != true_pattern_undirected:
-                    return [True, True, False, CI_facts, CD_facts]
-                else:
-                    continue
-            return [True, True, True, CI_facts, CD_facts]
+        # G* is not P-minimal iff some G_pi has fewer edges, adj(G_pi) is a subset of adj(G*) (and thus a proper
+        # subset), and I(G*) is a subset of I(G_pi)
+        for pi_edges in DAGsWithinBound(no_of_true_edges - 1, true_neighbors):
+            # We construct the DSeparation object for G_pi to check d-separation.
+            pi_d_sep = DSeparation(no_of_nodes, pi_edges)
+            if all(pi_d_sep.isDSep(CI[0], CI[1], CI[2]) for CI in I_G_star):
+                return [False, False, False, facts.CIFacts(), facts.CDFacts()]
+
+        # G* is frugal iff no G_pi has fewer edges
+        if min_edges[0] < no_of_true_edges:
+            return [True, False, False, facts.CIFacts(), facts.CDFacts()]
+
+        # G* is u-frugal iff every G_pi with as many edges (a maximally frugal DAG) has the pattern of G*
+        true_pattern_directed, true_pattern_undirected = patternEdges(true_cg)
+        for pi_edges in DAGsWithinBound(no_of_true_edges, [full] * no_of_nodes):
+            est_cg = CausalGraph(no_of_nodes)
+            est_cg.adjmat[est_cg.adjmat == 0] = -1 # Initiate an empty graph
+            for (j, k) in pi_edges:
+                est_cg.addDirectedEdge(j, k)
+            est_pattern_directed, est_pattern_undirected = patternEdges(est_cg)
+            if est_pattern_directed != true_pattern_directed or est_pattern_undirected != true_pattern_undirected:
+                return [True, True, False, facts.CIFacts(), facts.CDFacts()]
+        return [True, True, True, facts.CIFacts(), facts.CDFacts()]
 
 #######################################################################################################################
 
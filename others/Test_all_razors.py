@@ -3,6 +3,7 @@ from GraphClass import tetradToCausalGraph
 from Test_CMC import CMCTester
 from Test_CFC import faithfulnessTester
 from Test_P_Minimality_M2_and_Frugality import pMinM2FruTester
+from FactStore import FactStore
 import numpy as np
 import time
 #######################################################################################################################
@@ -27,20 +28,19 @@ def razorsTester(truth_path, data_path, test_name, alpha):
     true_cg = tetradToCausalGraph(truth_path)
     data = np.loadtxt(data_path, skiprows=1)
     start = time.time()
-    CMC, I_G_star = CMCTester(true_cg, data, test_name, alpha)
+    facts = FactStore(alpha)  # the facts decided by each tester are reused by the next ones
+    CMC, I_G_star = CMCTester(true_cg, data, test_name, alpha, facts=facts)
 
     if not CMC:
         end1 = time.time()
         return [int(CMC), 0, 0, 0, 0, 0, 0, 0, round(end1 - start, 2)]
     else:
-        firstResults = pMinM2FruTester(true_cg, data, test_name, alpha, CMC_result = [CMC, I_G_star])
+        firstResults = pMinM2FruTester(true_cg, data, test_name, alpha, CMC_result = [CMC, I_G_star], facts=facts)
         pMinimal = firstResults[0]
         Frugal = firstResults[1]
         uFrugal = firstResults[2]
-        CI_facts = firstResults[3]
-        CD_facts = firstResults[4]
         CFC, adj_faithful, ori_faithful = faithfulnessTester(true_cg, data, test_name, alpha,
-                                                             CI_facts=CI_facts, CD_facts=CD_facts)
+                                                             CMC_result = [CMC, I_G_star], facts=facts)
         end2 = time.time()
         return [int(CMC), int(pMinimal), int(Frugal), int(uFrugal),
                 int(adj_faithful), int(ori_faithful), int(adj_faithful and ori_faithful), int(CFC),
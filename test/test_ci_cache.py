@@ -0,0 +1,92 @@
+#######################################################################################################################
+import os
+import sys
+import numpy as np
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "others")]
+from DataLoader import loadData
+from GraphClass import CausalGraph
+from PC import orientEdges, pcAlgorithm, pcAlgorithmSweep
+from PC_Algorithm_Phase1 import skeletonDiscovery
+from Test_CMC import CMCTester
+#######################################################################################################################
+
+
+def emptyGraph(no_of_var):
+    """Return a CausalGraph without edges whose nx_graph holds the nodes"""
+    cg = CausalGraph(no_of_var)
+    cg.adjmat[cg.adjmat == 0] = -1
+    cg.nx_graph.add_nodes_from(range(no_of_var))
+    return cg
+
+#######################################################################################################################
+
+
+def test_cache_is_cleared_when_the_data_change():
+    rng = np.random.default_rng(0)
+    independent = rng.normal(size=(500, 2))
+    dependent = independent.copy()
+    dependent[:, 1] += dependent[:, 0]
+
+    cg = emptyGraph(2)
+    assert CMCTester(cg, independent, "Fisher_Z", 0.01)[0]
+    assert not CMCTester(cg, dependent, "Fisher_Z", 0.01)[0]  # the same graph reused on another data set
+    assert not CMCTester(emptyGraph(2), dependent, "Fisher_Z", 0.01)[0]
+
+#######################################################################################################################
+
+
+def test_closed_form_skeleton_fills_the_cache():
+    data, _ = loadData(os.path.join(ROOT, "test", "test_data.txt"), use_cache=False)
+    cg = skeletonDiscovery(data, 0.05, "Fisher_Z", True)
+    no_of_var = data.shape[1]
+    cached = dict(cg.ci_cache.results)
+    for i in range(no_of_var):
+        for j in range(i + 1, no_of_var):  # every pair is tested at depth 0
+            assert np.isclose(cached[(i, j, frozenset())], cg.ci_statistic(i, j, ())[1])
+    depth_1 = [(i, j, S) for (i, j, S) in cached if len(S) == 1]
+    assert len(depth_1) > 0
+    for (i, j, S) in depth_1:
+        assert np.isclose(cached[(i, j, S)], cg.ci_statistic(i, j, tuple(S))[1])
+
+    hits = cg.ci_cache.hits
+    orientEdges(cg, 0.05, 1, 2)  # maxP
+    assert cg.ci_cache.hits > hits
+    fresh = [S for (i, j, S) in cg.ci_cache.results if (i, j, S) not in cached]
+    assert all(len(S) > 0 for S in fresh)  # no marginal test is run again
+
+#######################################################################################################################
+
+
+def test_parallel_skeleton_fills_the_cache():
+    data, _ = loadData(os.path.join(ROOT, "test", "test_data.txt"), use_cache=False)
+    discrete = np.stack([np.digitize(column, np.quantile(column, [1 / 3, 2 / 3])) for column in data[:, :8].T], 1)
+    for (test_data, test_name) in [(data, "Fisher_Z"), (discrete.astype(float), "G_sq")]:
+        runs = []
+        for n_jobs in [1, 2]:
+            cg = skeletonDiscovery(test_data, 0.05, test_name, True, n_jobs=n_jobs)
+            hits = cg.ci_cache.hits
+            orientEdges(cg.copy(), 0.05, 1, 2)  # maxP
+            runs.append((cg, cg.ci_cache.hits - hits))
+        (serial, serial_hits), (parallel, parallel_hits) = runs
+        assert np.array_equal(serial.adjmat, parallel.adjmat, equal_nan=True)
+        assert sorted(serial.sepset.items()) == sorted(parallel.sepset.items())
+        assert serial_hits > 0 and serial_hits == parallel_hits
+
+#######################################################################################################################
+
+
+def test_sweep_derives_each_skeleton_from_one_pass():
+    data, _ = loadData(os.path.join(ROOT, "test", "test_data.txt"), use_cache=False)
+    alphas = [0.01, 0.05, 0.1, 0.2]
+    cg_list, edge_alpha, _ = pcAlgorithmSweep(data, alphas, "Fisher_Z", True, 1, 2)
+    for (alpha, cg) in zip(alphas, cg_list):
+        adjacent = cg.adjmat != -1
+        np.fill_diagonal(adjacent, False)
+        assert np.array_equal(adjacent, edge_alpha <= alpha)
+        single = pcAlgorithm(data, alpha, "Fisher_Z", True, 1, 2)
+        assert not np.any(adjacent & (single.adjmat == -1))  # no edge removed by a run at alpha is kept
+    assert np.array_equal(cg_list[-1].adjmat, pcAlgorithm(data, alphas[-1], "Fisher_Z", True, 1, 2).adjmat,
+                          equal_nan=True)
+
+#######################################################################################################################
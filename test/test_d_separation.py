@@ -0,0 +1,62 @@
+#######################################################################################################################
+import os
+import sys
+from itertools import combinations
+import networkx as nx
+import numpy as np
+import pytest
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "others")]
+from DSeparation import DSeparation
+from Helper import maskMembers, setMask
+#######################################################################################################################
+
+
+def randomDag(no_of_nodes, edge_probability, seed):
+    """Return a random DAG (nx.DiGraph object) whose edges go from lower to higher nodes of a random order"""
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(no_of_nodes)
+    dag = nx.DiGraph()
+    dag.add_nodes_from(range(no_of_nodes))
+    dag.add_edges_from((int(order[a]), int(order[b])) for (a, b) in combinations(range(no_of_nodes), 2)
+                       if rng.random() < edge_probability)
+    return dag
+
+#######################################################################################################################
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_queries_and_separators_match_brute_force(seed):
+    dag = randomDag(7, 0.4, seed)
+    d_sep = DSeparation.fromNxGraph(dag)
+    for (x, y) in combinations(range(7), 2):
+        others = [v for v in range(7) if v not in (x, y)]
+        condition_sets = [S for size in range(len(others) + 1) for S in combinations(others, size)]
+        expected = np.array([nx.is_d_separator(dag, {x}, {y}, set(S)) for S in condition_sets])
+        assert np.array_equal(d_sep.isDSepBatch(x, y, condition_sets), expected)
+        assert [d_sep.isDSep(x, y, S) for S in condition_sets] == expected.tolist()
+
+        separators = sorted(setMask(S) for (S, separated) in zip(condition_sets, expected) if separated)
+        assert sorted(d_sep.separators(x, y)) == separators
+        for size in range(len(others) + 1):
+            assert sorted(d_sep.separators(x, y, size)) == [mask for mask in separators
+                                                            if len(maskMembers(mask)) == size]
+
+#######################################################################################################################
+
+
+def test_more_than_64_nodes():
+    dag = randomDag(70, 0.05, 0)
+    d_sep = DSeparation.fromNxGraph(dag)
+    rng = np.random.default_rng(1)
+    for (x, y) in [(0, 69), (3, 40), (65, 12), (66, 67)]:
+        others = [v for v in range(70) if v not in (x, y)]
+        condition_sets = [tuple(rng.choice(others, size, replace=False).tolist()) for size in [0, 1, 3, 10, 30]
+                          for _ in range(4)]
+        expected = [nx.is_d_separator(dag, {x}, {y}, set(S)) for S in condition_sets]
+        assert d_sep.isDSepBatch(x, y, condition_sets).tolist() == expected
+        for size in [0, 1]:
+            assert sorted(d_sep.separators(x, y, size)) == \
+                sorted(setMask(S) for S in combinations(others, size) if nx.is_d_separator(dag, {x}, {y}, set(S)))
+
+#######################################################################################################################
@@ -0,0 +1,59 @@
+#######################################################################################################################
+import os
+import sys
+import numpy as np
+import pytest
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "others")]
+from DataLoader import loadData, dataCachePaths, readCacheMetadata
+#######################################################################################################################
+
+
+def writeDataFile(PATH, data):
+    np.savetxt(PATH, data, fmt="%.4f", delimiter="\t", header="X1\tX2\tX3", comments="")
+
+#######################################################################################################################
+
+
+def test_cache_is_memory_mapped_and_rebuilt_when_the_file_changes(tmp_path):
+    PATH = str(tmp_path / "data.txt")
+    data = np.arange(12, dtype=float).reshape(4, 3)
+    writeDataFile(PATH, data)
+
+    loaded, column_names = loadData(PATH)
+    assert not isinstance(loaded, np.memmap) and np.array_equal(loaded, data) and column_names == ["X1", "X2", "X3"]
+    assert all(os.path.exists(cache_path) for cache_path in dataCachePaths(PATH))
+    cached, column_names = loadData(PATH)
+    assert isinstance(cached, np.memmap) and np.array_equal(cached, data) and column_names == ["X1", "X2", "X3"]
+
+    data = np.vstack((data, [[1.5, 2.5, 3.5]]))  # the size of the file changes
+    writeDataFile(PATH, data)
+    loaded, _ = loadData(PATH)
+    assert not isinstance(loaded, np.memmap) and np.array_equal(loaded, data)
+    assert isinstance(loadData(PATH)[0], np.memmap)
+
+    data[0, 0] = 9  # the size of the file stays the same, only its modification time changes
+    writeDataFile(PATH, data)
+    status = os.stat(PATH)
+    os.utime(PATH, ns=(status.st_atime_ns, status.st_mtime_ns + 10 ** 9))  # even if written within the same tick
+    loaded, _ = loadData(PATH)
+    assert not isinstance(loaded, np.memmap) and np.array_equal(loaded, data)
+    cached, _ = loadData(PATH)
+    assert isinstance(cached, np.memmap) and np.array_equal(cached, data)
+
+#######################################################################################################################
+
+
+def test_data_are_loaded_when_the_cache_cannot_be_written(tmp_path):
+    PATH = str(tmp_path / "data.txt")
+    data = np.arange(6, dtype=float).reshape(2, 3)
+    writeDataFile(PATH, data)
+    os.mkdir(dataCachePaths(PATH)[0] + ".tmp")  # the temporary cache file cannot be created
+
+    for _ in range(2):
+        with pytest.warns(UserWarning, match="cannot write the data cache"):
+            loaded, column_names = loadData(PATH)
+        assert not isinstance(loaded, np.memmap) and np.array_equal(loaded, data)
+    assert readCacheMetadata(PATH) is None
+
+#######################################################################################################################
@@ -0,0 +1,57 @@
+#######################################################################################################################
+import os
+import sys
+import numpy as np
+import pytest
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "others")]
+from DataLoader import loadData
+from GraphClass import CausalGraph
+from IncrementalPC import IncrementalPC, graphDiff
+from PC import pcAlgorithm
+#######################################################################################################################
+
+
+def discreteOrContinuousData(test_name):
+    """Return the test data set, discretized into three levels per variable for the chi-square tests"""
+    data, _ = loadData(os.path.join(ROOT, "test", "test_data.txt"), use_cache=False)
+    if test_name == "Fisher_Z":
+        return data
+    data = data[:, :8]
+    return np.stack([np.digitize(column, np.quantile(column, [1 / 3, 2 / 3])) for column in data.T], 1).astype(float)
+
+#######################################################################################################################
+
+
+@pytest.mark.parametrize("test_name", ["Fisher_Z", "Chi_sq"])
+def test_without_reuse_each_update_is_pc_on_all_the_rows(test_name):
+    data = discreteOrContinuousData(test_name)
+    incremental = IncrementalPC(0.05, test_name, uc_rule=1, uc_priority=2, margin=float('inf'))
+    ends = [0, len(data) // 4, len(data) // 2, len(data)]
+    for (start, end) in zip(ends[:-1], ends[1:]):
+        cg, _ = incremental.update(data[start:end])
+        assert incremental.sampleSize() == end
+        assert incremental.tests_reused == 0
+        expected = pcAlgorithm(data[:end], 0.05, test_name, True, 1, 2)
+        assert np.array_equal(cg.adjmat, expected.adjmat, equal_nan=True)
+
+#######################################################################################################################
+
+
+def test_graph_diff():
+    def graph(directed, undirected):
+        cg = CausalGraph(4)
+        cg.adjmat[cg.adjmat == 0] = -1
+        for (i, j) in directed:
+            cg.addDirectedEdge(i, j)
+        for (i, j) in undirected:
+            cg.adjmat[i, j] = cg.adjmat[j, i] = 0
+        return cg
+
+    old = graph([(0, 1)], [(1, 2), (2, 3)])
+    new = graph([(1, 0), (2, 3)], [(0, 3)])
+    assert graphDiff(old, new) == {"added": [(0, 3)], "removed": [(1, 2)], "reoriented": [(0, 1), (2, 3)]}
+    assert graphDiff(None, old) == {"added": [(0, 1), (1, 2), (2, 3)], "removed": [], "reoriented": []}
+    assert graphDiff(new, new) == {"added": [], "removed": [], "reoriented": []}
+
+#######################################################################################################################
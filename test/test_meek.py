@@ -0,0 +1,81 @@
+#######################################################################################################################
+import os
+import sys
+from itertools import combinations
+import numpy as np
+import pytest
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "others")]
+from GraphClass import CausalGraph
+from PC_Algorithm_Phase3 import Meek, definite_Meek
+#######################################################################################################################
+
+
+def sweepMeek(cg, definite=False):
+    """The fixed-point sweep of Meek (or definite_Meek) rules which propagate replaces"""
+    cg_new = cg.copy()
+    UT = cg_new.findUnshieldedTriples()
+    Tri = cg_new.findTriangles()
+    Kite = cg_new.findKites()
+    Loop = True
+    while Loop:
+        Loop = False
+        for (i, j, k) in (cg_new.definite_non_UC if definite else UT):
+            if cg_new.isFullyDirected(i, j) and cg_new.isUndirected(j, k):
+                cg_new.adjmat[j, k] = 1
+                Loop = True
+            elif definite and cg_new.isFullyDirected(k, j) and cg_new.isUndirected(j, i):
+                cg_new.adjmat[j, i] = 1
+                Loop = True
+        for (i, j, k) in Tri:
+            if cg_new.isFullyDirected(i, j) and cg_new.isFullyDirected(j, k) and cg_new.isUndirected(i, k):
+                cg_new.adjmat[i, k] = 1
+                Loop = True
+        for (i, j, k, l) in Kite:
+            if definite:
+                applies = ((j, l, k) in cg_new.definite_UC or (k, l, j) in cg_new.definite_UC) \
+                          and ((j, i, k) in cg_new.definite_non_UC or (k, i, j) in cg_new.definite_non_UC)
+            else:
+                applies = cg_new.isUndirected(i, j) and cg_new.isUndirected(i, k) \
+                          and cg_new.isFullyDirected(j, l) and cg_new.isFullyDirected(k, l)
+            if applies and cg_new.isUndirected(i, l):
+                cg_new.adjmat[i, l] = 1
+                Loop = True
+    return cg_new
+
+#######################################################################################################################
+
+
+def randomPattern(no_of_var, edge_probability, seed):
+    """Return the skeleton of a random DAG with its unshielded colliders and a random part of its other edges
+    oriented as in the DAG, and with its unshielded triples recorded as definite (non-)colliders"""
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(no_of_var)
+    edges = [(int(order[a]), int(order[b])) for (a, b) in combinations(range(no_of_var), 2)
+             if rng.random() < edge_probability]
+    cg = CausalGraph(no_of_var)
+    cg.adjmat[cg.adjmat == 0] = -1
+    for (i, j) in edges:
+        cg.adjmat[i, j] = cg.adjmat[j, i] = 0
+    parents = {(i, j) for (i, j) in edges}
+    for (i, j, k) in cg.findUnshieldedTriples():
+        if (i, j) in parents and (k, j) in parents:
+            cg.definite_UC.append((i, j, k))
+        else:
+            cg.definite_non_UC.append((i, j, k))
+    oriented = [(i, j) for (i, j, k) in cg.definite_UC] + [(k, j) for (i, j, k) in cg.definite_UC]
+    oriented += [edge for edge in edges if rng.random() < 0.2]
+    for (i, j) in oriented:
+        cg.adjmat[i, j] = 1
+    return cg
+
+#######################################################################################################################
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_propagation_matches_the_sweep(seed):
+    cg = randomPattern(12, 0.5, seed)
+    assert np.array_equal(Meek(cg).adjmat, sweepMeek(cg).adjmat, equal_nan=True)
+    assert np.array_equal(definite_Meek(cg).adjmat, sweepMeek(cg, definite=True).adjmat, equal_nan=True)
+
+#######################################################################################################################
@@ -0,0 +1,95 @@
+#######################################################################################################################
+import os
+import sys
+from itertools import combinations, permutations
+import numpy as np
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "others")]
+from DSeparation import DSeparation
+from GenerateDAG import dSepRelations
+from GraphClass import CausalGraph, toPattern
+from Test_P_Minimality_M2_and_Frugality import pMinM2FruTester
+#######################################################################################################################
+
+
+def randomModel(no_of_nodes, seed):
+    """Return a random DAG G* (CausalGraph object), I(G*), and the CI and CD facts of a distribution satisfying CMC for
+    G*: the independences are the d-separations of a random subgraph of G* and a few more at random"""
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(no_of_nodes)
+    edges = [(int(order[a]), int(order[b])) for (a, b) in combinations(range(no_of_nodes), 2) if rng.random() < 0.6]
+    true_cg = CausalGraph(no_of_nodes)
+    true_cg.adjmat[true_cg.adjmat == 0] = -1
+    for (i, j) in edges:
+        true_cg.addDirectedEdge(i, j)
+    true_cg.nx_graph.add_nodes_from(range(no_of_nodes))
+    true_cg.nx_graph.add_edges_from(edges)
+    I_G_star = list(dSepRelations(true_cg.nx_graph))
+
+    keep, extra = rng.uniform(0.6, 1), rng.uniform(0, 0.15)  # models of all the verdicts arise for some seeds
+    sub_dag = DSeparation(no_of_nodes, [edge for edge in edges if rng.random() < keep])
+    CI_facts, CD_facts = [], []
+    for (i, j) in combinations(range(no_of_nodes), 2):
+        others = [v for v in range(no_of_nodes) if v not in (i, j)]
+        for size in range(len(others) + 1):
+            for S in combinations(others, size):
+                if sub_dag.isDSep(i, j, S) or rng.random() < extra:
+                    CI_facts.append([i, j, S])
+                else:
+                    CD_facts.append([i, j, S])
+    return true_cg, I_G_star, CI_facts, CD_facts
+
+#######################################################################################################################
+
+
+def bruteForceVerdicts(true_cg, I_G_star, CI_facts):
+    """Return P-minimality, frugality and u-frugality of true_cg by building the DAG G_pi of every ordering pi"""
+    no_of_nodes = true_cg.adjmat.shape[0]
+    independent = {(i, j, tuple(S)) for (i, j, S) in CI_facts}
+    independent |= {(i, j, tuple(S)) for (i, j, S) in I_G_star}
+    true_edges = true_cg.findFullyDirected()
+    true_adj = {(min(i, j), max(i, j)) for (i, j) in true_edges}
+
+    def pattern(edges):
+        cg = CausalGraph(no_of_nodes)
+        cg.adjmat[cg.adjmat == 0] = -1
+        for (i, j) in edges:
+            cg.addDirectedEdge(i, j)
+        cg_pattern = toPattern(cg, checkDAG=False)
+        return set(cg_pattern.findFullyDirected()), {(i, j) for (i, j) in cg_pattern.findUndirected() if i < j}
+
+    P_minimal, frugal, same_size = True, True, []
+    for pi in permutations(range(no_of_nodes)):
+        pi_edges = [(pi[a], pi[b]) for (a, b) in combinations(range(no_of_nodes), 2)
+                    if (min(pi[a], pi[b]), max(pi[a], pi[b]), tuple(sorted(pi[:a] + pi[a + 1:b]))) not in independent]
+        if len(pi_edges) == len(true_edges):
+            same_size.append(pi_edges)
+        elif len(pi_edges) < len(true_edges):
+            frugal = False
+            pi_d_sep = DSeparation(no_of_nodes, pi_edges)
+            if {(min(i, j), max(i, j)) for (i, j) in pi_edges} <= true_adj \
+                    and all(pi_d_sep.isDSep(i, j, S) for (i, j, S) in I_G_star):
+                P_minimal = False
+    if not P_minimal:
+        return [False, False, False]
+    if not frugal:
+        return [True, False, False]
+    return [True, True, all(pattern(pi_edges) == pattern(true_edges) for pi_edges in same_size)]
+
+#######################################################################################################################
+
+
+def test_verdicts_match_brute_force():
+    outcomes = set()
+    for no_of_nodes in [4, 5]:
+        for seed in range(100):
+            true_cg, I_G_star, CI_facts, CD_facts = randomModel(no_of_nodes, seed)
+            data = np.random.default_rng(seed).normal(size=(50, no_of_nodes))  # the facts decide every test
+            result = pMinM2FruTester(true_cg, data, "Fisher_Z", 0.05, CMC_result=[True, I_G_star],
+                                     CI_facts=CI_facts, CD_facts=CD_facts)
+            expected = bruteForceVerdicts(true_cg, I_G_star, CI_facts)
+            assert result[:3] == expected
+            outcomes.add(tuple(expected))
+    assert len(outcomes) == 4  # not P-minimal, P-minimal only, frugal only, and u-frugal models are all covered
+
+#######################################################################################################################
@@ -0,0 +1,34 @@
+#######################################################################################################################
+import os
+import sys
+import pytest
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "others")]
+from Helper import SepsetStore, setMask
+#######################################################################################################################
+
+
+@pytest.mark.parametrize("no_of_var", [8, 64, 65, 200])
+def test_sepset_store(no_of_var):
+    last = no_of_var - 1
+    store = SepsetStore(no_of_var)
+    assert len(store) == 0 and store[(0, 1)] is None and not store.contains(0, 1, 2)
+
+    store.add(0, 1, (3, 2))
+    store.add(1, 0, [2, 3])  # the same set of the same pair is stored once
+    store.add(0, 1, ())
+    store.add(last, 2, (last - 1, 0, 1))
+    store.add(3, 4, (last,))
+
+    assert len(store) == 3
+    assert store[(0, 1)] == [(2, 3), ()] and store[(1, 0)] == [(2, 3), ()]
+    assert store[(2, last)] == [(0, 1, last - 1)]
+    assert store[(0, 2)] is None
+    assert store.contains(1, 0, 3) and not store.contains(0, 1, 4)
+    assert store.contains(2, last, last - 1) and not store.contains(2, last, 3)
+    assert store.contains(4, 3, last)
+    assert store.masks(0, 1) == [setMask((2, 3)), 0]
+    assert sorted(store.items()) == sorted([(0, 1, [setMask((2, 3)), 0]), (2, last, [setMask((0, 1, last - 1))]),
+                                            (3, 4, [setMask((last,))])])
+
+#######################################################################################################################